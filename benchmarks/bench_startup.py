@@ -0,0 +1,91 @@
+# Startup benchmark: how long a fresh process takes to import main.py and finish setup_hook,
+# and with --live (needs DISCORD_TOKEN) how long until on_ready.
+# Usage: python benchmarks/bench_startup.py [--runs 5] [--live] [--output results.json]
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+UNWANTED_MODULES = ("praw", "asyncpraw", "requests", "sqlite3", "aiohttp.web")  # Should not load unless used
+
+def child(live):
+    # Runs in a fresh interpreter; prints one JSON line with its timings
+    started = time.perf_counter()
+    sys.path.insert(0, REPO_DIR)
+    import main
+    timings = {"import_s": time.perf_counter() - started}
+    timings["loaded_unwanted"] = [name for name in UNWANTED_MODULES if name in sys.modules]
+
+    async def start():
+        if live:
+            ready = asyncio.create_task(main.bot.wait_until_ready())
+            login = asyncio.create_task(main.bot.start(main.TOKEN))
+            await asyncio.wait({ready, login}, return_when=asyncio.FIRST_COMPLETED)
+            timings["ready_s"] = time.perf_counter() - started if ready.done() else None
+        else:
+            await main.bot.setup_hook()
+        timings["setup_s"] = time.perf_counter() - started
+        await main.bot.close()
+
+    asyncio.run(start())
+    print(json.dumps(timings))
+
+def run_once(live, store_path):
+    env = dict(os.environ, CHANNEL_STORE_PATH=store_path)
+    env.setdefault("METRICS_PORT", "0")
+    command = [sys.executable, os.path.abspath(__file__), "--child"] + (["--live"] if live else [])
+    started = time.perf_counter()
+    output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process_s"] = time.perf_counter() - started
+    return timings
+
+def interpreter_baseline():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - started
+
+def summarize(runs, key):
+    values = sorted(run[key] for run in runs if run.get(key) is not None)
+    if not values:
+        return None
+    return {"min": values[0], "median": values[len(values) // 2], "max": values[-1]}
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Measure Meme Master's cold start.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="Log in to Discord and time until on_ready (needs DISCORD_TOKEN)")
+    parser.add_argument("--output", help="Also save the results as JSON to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.live)
+        return
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        store_path = os.path.join(store_dir, "memebot.db")
+        run_once(args.live, store_path)  # Warm the OS file cache so every measured run starts alike
+        runs = [run_once(args.live, store_path) for _ in range(args.runs)]
+
+    report = {
+        "runs": args.runs,
+        "live": args.live,
+        "interpreter_s": interpreter_baseline(),
+        "import_s": summarize(runs, "import_s"),
+        "setup_hook_done_s": summarize(runs, "setup_s"),
+        "on_ready_s": summarize(runs, "ready_s"),
+        "process_s": summarize(runs, "process_s"),
+        "loaded_unwanted": sorted({name for run in runs for name in run["loaded_unwanted"]}),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,93 @@
+# Local stand-ins for Reddit, JokeAPI and Giphy that serve recorded payloads from
+# benchmarks/fixtures with configurable latency and error rate.
+import asyncio
+import copy
+import json
+import os
+import random
+from collections import Counter
+
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+class FakeUpstreams:
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0, host="127.0.0.1", port=0):
+        self.latency = latency  # Seconds added to every response
+        self.jitter = jitter  # Extra random delay, up to this many seconds
+        self.error_rate = error_rate  # Fraction of requests answered with a 503
+        self.host = host
+        self.port = port
+        self.requests = Counter()  # route -> requests served
+        self.listings = {name: load_fixture(f"reddit_{name}.json") for name in ("hot", "top", "new", "search")}
+        self.jokes = load_fixture("jokeapi_jokes.json")["jokes"]
+        self.gifs = load_fixture("giphy_search.json")["data"]
+        self.runner = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def delay_or_fail(self, route):
+        self.requests[route] += 1
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        if self.error_rate and random.random() < self.error_rate:
+            raise web.HTTPServiceUnavailable()
+
+    async def reddit_listing(self, request):
+        listing = request.match_info["listing"]
+        await self.delay_or_fail(f"reddit_{listing}")
+        if listing not in self.listings:
+            raise web.HTTPNotFound()
+        subreddit = request.match_info["subreddit"].lower()
+        data = copy.deepcopy(self.listings[listing])
+        children = data["data"]["children"][:int(request.query.get("limit", 25))]
+        for child in children:
+            # Keep post IDs distinct per subreddit, like the real thing
+            child["data"]["id"] = f"{subreddit}_{child['data']['id']}"
+            child["data"]["subreddit"] = subreddit
+        data["data"]["children"] = children
+        return web.json_response(data, headers={"X-Ratelimit-Remaining": "600", "X-Ratelimit-Reset": "600"})
+
+    async def joke(self, request):
+        await self.delay_or_fail("jokeapi")
+        amount = int(request.query.get("amount", 1))
+        jokes = random.sample(self.jokes, min(amount, len(self.jokes)))
+        if amount == 1:
+            return web.json_response(jokes[0])
+        return web.json_response({"error": False, "amount": len(jokes), "jokes": jokes})
+
+    async def giphy_search(self, request):
+        await self.delay_or_fail("giphy")
+        offset = int(request.query.get("offset", 0))
+        limit = int(request.query.get("limit", 25))
+        keyword = request.query.get("q", "")
+        page = copy.deepcopy(self.gifs[offset:offset + limit])
+        for gif in page:
+            gif["id"] = f"{keyword}_{gif['id']}"
+        return web.json_response({
+            "data": page,
+            "pagination": {"total_count": len(self.gifs), "count": len(page), "offset": offset},
+            "meta": {"status": 200, "msg": "OK"}
+        })
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/r/{subreddit}/{listing}.json", self.reddit_listing)
+        app.router.add_get("/joke/{categories}", self.joke)
+        app.router.add_get("/v1/gifs/search", self.giphy_search)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
@@ -0,0 +1,297 @@
+# Interaction load harness: fires slash commands and their button callbacks at the command
+# tree with fake interactions (no gateway), against the local upstream stand-ins.
+# Records time-to-acknowledge, time-to-first-response, errors and missed 3-second deadlines,
+# and watches the event loop for blocking calls. Exits non-zero when a check fails.
+# Usage: python benchmarks/load_interactions.py [--invocations 2000] [--concurrency 500] ...
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+
+import discord
+
+from run_benchmarks import UpstreamThread, import_bot, percentiles
+import run_benchmarks
+
+# command -> (weight, options factory, buttons to click on the first response, in order)
+WORKLOAD = {
+    "meme": (4, lambda: {"subreddit": random.choice(["memes", "dankmemes", "wholesomememes"])}, ["New Meme", "New Meme"]),
+    "meme_search": (2, lambda: {"keyword": random.choice(["cat", "dog", "monday", "code"])}, ["Next", "Next", "Previous"]),
+    "top_memes": (2, lambda: {"timeframe": random.choice(["day", "week", "month", "year"]), "count": 5}, []),
+    "memes_by_number": (1, lambda: {"count": random.randint(1, 20)}, []),
+}
+
+# Most upstream requests a single invocation may make, checked after the load run
+UPSTREAM_BUDGETS = {
+    "memes_by_number": 1,
+    "top_memes": 0,  # Answered from the background-refreshed listings
+}
+
+class Timeline:
+    # What one command invocation or button click looked like from Discord's side
+    def __init__(self, label, deadline):
+        self.label = label
+        self.deadline = deadline
+        self.started = time.perf_counter()
+        self.acked_at = None
+        self.first_response_at = None
+        self.last_view = None
+        self.error_replies = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def respond(self, content, kwargs):
+        if self.first_response_at is None:
+            self.first_response_at = self.elapsed()
+        if kwargs.get("view") is not None:
+            self.last_view = kwargs["view"]
+        if content and "error" in str(content).lower():
+            self.error_replies += 1
+
+class FakeResponse:
+    # Mirrors discord.InteractionResponse, including refusing a second acknowledgement
+    def __init__(self, interaction, timeline):
+        self.interaction = interaction
+        self.timeline = timeline
+
+    def is_done(self):
+        return self.timeline.acked_at is not None
+
+    def _ack(self):
+        if self.is_done():
+            raise discord.InteractionResponded(self.interaction)
+        self.timeline.acked_at = self.timeline.elapsed()
+
+    async def defer(self, **kwargs):
+        self._ack()
+
+    async def send_message(self, content=None, **kwargs):
+        self._ack()
+        self.timeline.respond(content, kwargs)
+
+    async def edit_message(self, content=None, **kwargs):
+        self._ack()
+        self.timeline.respond(content, kwargs)
+
+class FakeFollowup:
+    def __init__(self, timeline):
+        self.timeline = timeline
+
+    async def send(self, content=None, **kwargs):
+        if self.timeline.acked_at is None:
+            raise RuntimeError("followup sent before the interaction was acknowledged")
+        self.timeline.respond(content, kwargs)
+        return SimpleNamespace(id=0, content=content)
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.mention = f"<@{user_id}>"
+        self.bot = False
+
+    def __str__(self):
+        return self.name
+
+def make_interaction(timeline, command, channel_id, guild_id, user_id):
+    interaction = SimpleNamespace(
+        type=discord.InteractionType.application_command,
+        data={"name": command.name},
+        command=command,
+        user=FakeUser(user_id),
+        channel_id=channel_id,
+        guild_id=guild_id,
+        channel=SimpleNamespace(id=channel_id),
+        guild=None,
+        extras={},
+    )
+    interaction.response = FakeResponse(interaction, timeline)
+    interaction.followup = FakeFollowup(timeline)
+    return interaction
+
+class LoadHarness:
+    def __init__(self, args):
+        self.args = args
+        self.timelines = []
+        self.exceptions = Counter()  # label -> exceptions raised out of the callback
+        self.slots = asyncio.Semaphore(args.concurrency)
+
+    async def invoke(self, name, options):
+        main = run_benchmarks.main
+        command = main.bot.tree.get_command(name)
+        channel_id = random.randrange(self.args.channels)
+        guild_id = random.randrange(self.args.guilds)
+        user_id = random.randrange(10**6)
+        timeline = Timeline(name, self.args.deadline)
+        interaction = make_interaction(timeline, command, channel_id, guild_id, user_id)
+        self.timelines.append(timeline)
+
+        # Same order as a real dispatch: on_interaction, the tree's check, the command, completion
+        try:
+            await main.on_interaction(interaction)
+            await main.bot.tree.interaction_check(interaction)
+            await command.callback(interaction, **options)
+            await main.on_app_command_completion(interaction, command)
+        except Exception as e:
+            main.record_command_latency(interaction, "error")
+            self.exceptions[name] += 1
+            print(f"/{name} raised {type(e).__name__}: {e}")
+            return
+
+        view = timeline.last_view
+        for label in WORKLOAD[name][2]:
+            if view is None:
+                break
+            button = next((item for item in view.children if getattr(item, "label", None) == label), None)
+            if button is None or button.disabled:
+                continue
+            click = Timeline(f"{name}:{label}", self.args.deadline)
+            click_interaction = make_interaction(click, command, channel_id, guild_id, user_id)
+            click_interaction.type = discord.InteractionType.component
+            self.timelines.append(click)
+            try:
+                await button.callback(click_interaction)
+            except Exception as e:
+                self.exceptions[click.label] += 1
+                print(f"{click.label} button raised {type(e).__name__}: {e}")
+                break
+            view = click.last_view or view
+
+    async def guarded(self, name, options):
+        async with self.slots:
+            await self.invoke(name, options)
+
+    async def upstream_requests_per_invocation(self, name, options):
+        # Runs one invocation on its own and counts the upstream requests it made
+        main = run_benchmarks.main
+        while main.background_tasks:
+            await asyncio.gather(*list(main.background_tasks), return_exceptions=True)  # Refills left over from the load
+        before = sum(main.upstream_request_counts.values())
+        timelines = len(self.timelines)
+        await self.invoke(name, options)
+        del self.timelines[timelines:]  # Keep the load report to the load run
+        return sum(main.upstream_request_counts.values()) - before
+
+    async def run(self):
+        names = list(WORKLOAD)
+        weights = [WORKLOAD[name][0] for name in names]
+        picks = random.choices(names, weights, k=self.args.invocations)
+        started = time.perf_counter()
+        await asyncio.gather(*(self.guarded(name, WORKLOAD[name][1]()) for name in picks))
+        return time.perf_counter() - started
+
+    def report(self):
+        by_label = defaultdict(list)
+        for timeline in self.timelines:
+            by_label[timeline.label].append(timeline)
+
+        report = {}
+        for label, timelines in sorted(by_label.items()):
+            acked = [t.acked_at for t in timelines if t.acked_at is not None]
+            responded = [t.first_response_at for t in timelines if t.first_response_at is not None]
+            report[label] = {
+                "invocations": len(timelines),
+                "exceptions": self.exceptions[label],
+                "error_replies": sum(t.error_replies for t in timelines),
+                "never_acknowledged": len(timelines) - len(acked),
+                "deadline_misses": sum(1 for t in timelines if t.acked_at is None or t.acked_at > t.deadline),
+                "time_to_ack_s": percentiles(acked),
+                "time_to_first_response_s": percentiles(responded),
+            }
+        return report
+
+async def run(args, upstreams):
+    main = run_benchmarks.main
+    main.get_http_session()
+    main.loop_monitor.start()
+    main.top_listings.start()
+    try:
+        harness = LoadHarness(args)
+        served_before = Counter(upstreams.requests)
+        elapsed = await harness.run()
+        commands = harness.report()
+        upstream_per_invocation = {
+            name: await harness.upstream_requests_per_invocation(name, options)
+            for name, options in (("memes_by_number", {"count": 20}), ("top_memes", {"timeframe": "week", "count": 10}))
+        }
+    finally:
+        main.loop_monitor.stop()
+        await main.top_listings.stop()
+        await main.prefetch_pool.stop()
+        await main.close_http_session()
+
+    return {
+        "invocations": args.invocations,
+        "concurrency": args.concurrency,
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(harness.timelines) / elapsed,
+        "commands": commands,
+        "event_loop": {
+            "max_lag_s": main.loop_monitor.max_lag,
+            "lag_p99_s": main.loop_lag.quantile(0.99),
+            "stalls": main.loop_monitor.stall_count,
+        },
+        "upstream_requests_served": dict(Counter(upstreams.requests) - served_before),
+        "upstream_requests_sent": dict(main.upstream_request_counts),
+        "upstream_requests_per_invocation": upstream_per_invocation,
+    }
+
+def check(result, args):
+    failures = []
+    for label, stats in result["commands"].items():
+        if stats["exceptions"]:
+            failures.append(f"{label}: {stats['exceptions']} exceptions")
+        if stats["deadline_misses"]:
+            failures.append(f"{label}: {stats['deadline_misses']} acknowledgements later than {args.deadline} s")
+    for name, requests in result["upstream_requests_per_invocation"].items():
+        if requests > UPSTREAM_BUDGETS[name]:
+            failures.append(f"/{name} made {requests} upstream requests (budget {UPSTREAM_BUDGETS[name]})")
+    if result["event_loop"]["max_lag_s"] > args.max_loop_lag:
+        failures.append(f"event loop blocked for {result['event_loop']['max_lag_s'] * 1000:.0f} ms (limit {args.max_loop_lag * 1000:.0f} ms)")
+    return failures
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load-test slash commands and buttons without a Discord gateway.")
+    parser.add_argument("--invocations", type=int, default=2000, help="Slash commands to fire; button clicks come on top")
+    parser.add_argument("--concurrency", type=int, default=500, help="Commands in flight at once")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds of latency added by the fake upstreams")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--channels", type=int, default=500)
+    parser.add_argument("--guilds", type=int, default=100)
+    parser.add_argument("--deadline", type=float, default=3.0, help="Seconds Discord allows before an interaction must be acknowledged")
+    parser.add_argument("--max-loop-lag", type=float, default=0.25, help="Fail when the event loop is blocked longer than this")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also save the results as JSON to this file")
+    return parser.parse_args()
+
+def main_harness():
+    args = parse_args()
+    random.seed(args.seed)
+    os.environ.setdefault("LOOP_PROBE_INTERVAL", "0.05")
+    os.environ.setdefault("LOOP_STALL_THRESHOLD", str(args.max_loop_lag))
+    upstream_thread = UpstreamThread(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    upstreams = upstream_thread.start()
+    try:
+        import_bot(upstreams.base_url)
+        result = asyncio.run(run(args, upstreams))
+    finally:
+        upstream_thread.stop()
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    failures = check(result, args)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main_harness()
@@ -0,0 +1,287 @@
+# Offline benchmark suite: drives get_meme, get_joke, /gif and the auto-post loop against
+# local stand-ins for Reddit, JokeAPI and Giphy, then saves the results as JSON.
+# Usage: python benchmarks/run_benchmarks.py [--scenarios get_meme,get_joke,gif,autopost] [--latency 0.05] ...
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from fake_upstreams import FakeUpstreams
+
+SCENARIOS = ("get_meme", "get_joke", "gif", "autopost")
+main = None  # Imported once the fake upstreams are listening
+
+def percentiles(samples):
+    if not samples:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": ordered[-1]}
+
+class UpstreamThread:
+    # Runs the fake upstreams on their own event loop so they don't compete with the bot's loop
+    def __init__(self, **options):
+        self.upstreams = FakeUpstreams(**options)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="fake-upstreams", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.upstreams.start(), self.loop).result()
+        return self.upstreams
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.upstreams.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+def import_bot(base_url):
+    global main
+    os.environ.update({
+        "REDDIT_BASE_URL": base_url,
+        "JOKEAPI_BASE_URL": base_url,
+        "GIPHY_BASE_URL": base_url,
+    })
+    # Benchmark the bot, not the production rate limits; export these to measure with them
+    for name in ("REDDIT_RATE_LIMIT", "JOKEAPI_RATE_LIMIT", "GIPHY_RATE_LIMIT"):
+        os.environ.setdefault(name, "10000")
+    for name in ("REDDIT_RATE_BURST", "JOKEAPI_RATE_BURST", "GIPHY_RATE_BURST"):
+        os.environ.setdefault(name, "1000")
+    os.environ.setdefault("CHANNEL_STORE_BACKEND", "memory")
+    os.environ.setdefault("JOKE_CORPUS_PATH", "")  # Keep runs independent of, and from writing, jokes.json
+    os.environ.setdefault("METRICS_PORT", "0")
+    main = importlib.import_module("main")
+
+def reset_meme_caches():
+    main.listing_cache.entries.clear()
+    main.prefetch_pool.buffers.clear()
+    main.prefetch_pool.last_requested.clear()
+    main.post_history.clear()
+
+async def drive(label, count, concurrency, call):
+    # Runs call(i) count times with at most concurrency in flight; call returns True on success
+    latencies = []
+    errors = 0
+    next_index = iter(range(count))
+
+    async def worker():
+        nonlocal errors
+        for i in next_index:
+            started = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "scenario": label,
+        "requests": count,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_per_s": count / elapsed if elapsed else None,
+        "latency_s": percentiles(latencies),
+    }
+
+async def bench_get_meme(args, warm):
+    if not warm:
+        reset_meme_caches()
+    subreddits = [f"memes{i}" for i in range(args.subreddits)]
+
+    async def call(i):
+        url, _ = await main.get_meme(random.choice(subreddits), random.randrange(args.channels))
+        return url is not None
+
+    return await drive("get_meme_warm" if warm else "get_meme_cold", args.requests, args.concurrency, call)
+
+async def bench_get_joke(args):
+    async def call(i):
+        setup, _ = await main.get_joke()
+        return setup is not None
+
+    return await drive("get_joke", args.requests, args.concurrency, call)
+
+class FakeFollowup:
+    async def send(self, *args, **kwargs):
+        return SimpleNamespace(id=0, content=args[0] if args else None)
+
+class FakeResponse:
+    def __init__(self):
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def defer(self, **kwargs):
+        self.done = True
+
+    async def send_message(self, *args, **kwargs):
+        self.done = True
+
+async def bench_gif(args):
+    keywords = ["cat", "dog", "fail", "dance", "party", "wow"]
+
+    async def call(i):
+        interaction = SimpleNamespace(
+            guild_id=random.randrange(args.guilds),
+            channel_id=random.randrange(args.channels),
+            response=FakeResponse(),
+            followup=FakeFollowup(),
+            extras={}
+        )
+        await main.gif.callback(interaction, random.choice(keywords))
+        return True
+
+    return await drive("gif", args.requests, args.concurrency, call)
+
+async def bench_autopost(args):
+    reset_meme_caches()
+    delivered = []
+
+    async def channel_send(content):
+        await asyncio.sleep(args.send_latency)  # Stand-in for the Discord API round trip
+        delivered.append(time.monotonic())
+        return SimpleNamespace(id=len(delivered), content=content)
+
+    subreddits = [f"memes{i}" for i in range(args.subreddits)]
+    channel_ids = range(10**9, 10**9 + args.autopost_channels)
+    for channel_id in channel_ids:
+        main.active_channels[channel_id] = {
+            "channel": SimpleNamespace(id=channel_id, send=channel_send),
+            "guild_id": channel_id % args.guilds,
+            "search_query": random.choice(subreddits),
+            "interval": args.autopost_interval
+        }
+        main.auto_post_scheduler.add(channel_id, args.autopost_interval, random.uniform(0, args.autopost_interval))
+
+    posted_before = main.memes_posted
+    sent_before, dropped_before = main.send_queue.sent, main.send_queue.dropped_stale
+    started = time.perf_counter()
+    main.send_queue.start()
+    main.auto_post_scheduler.start()
+    await asyncio.sleep(args.autopost_duration)
+    await main.auto_post_scheduler.stop()
+    elapsed = time.perf_counter() - started
+
+    for channel_id in channel_ids:
+        main.auto_post_scheduler.cancel(channel_id)
+        del main.active_channels[channel_id]
+    posted = main.memes_posted - posted_before
+    expected = args.autopost_channels * args.autopost_duration / args.autopost_interval
+    return {
+        "scenario": "autopost",
+        "channels": args.autopost_channels,
+        "interval_s": args.autopost_interval,
+        "elapsed_s": elapsed,
+        "memes_posted": posted,
+        "expected_posts": expected,
+        "throughput_per_s": posted / elapsed,
+        "sent": main.send_queue.sent - sent_before,
+        "dropped_stale": main.send_queue.dropped_stale - dropped_before,
+        "send_queue_depth": main.send_queue.size,
+        "send_queue_wait_s": {f"p{int(q * 100)}": main.send_queue_wait.quantile(q, main.PRIORITY_AUTOPOST) for q in (0.5, 0.9, 0.99)},
+    }
+
+async def run_scenario(name, args):
+    if name == "get_meme":
+        return [await bench_get_meme(args, warm=False), await bench_get_meme(args, warm=True)]
+    if name == "get_joke":
+        return [await bench_get_joke(args)]
+    if name == "gif":
+        return [await bench_gif(args)]
+    return [await bench_autopost(args)]
+
+async def run(args, upstreams):
+    main.get_http_session()
+    results = []
+    try:
+        for name in args.scenarios:
+            served_before = Counter(upstreams.requests)
+            sent_before = Counter(main.upstream_request_counts)
+            if args.tracemalloc:
+                tracemalloc.start()
+            for result in await run_scenario(name, args):
+                results.append(result)
+            if args.tracemalloc:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                results[-1]["peak_traced_memory_bytes"] = peak
+            results[-1]["upstream_requests_served"] = dict(Counter(upstreams.requests) - served_before)
+            results[-1]["upstream_requests_sent"] = dict(main.upstream_request_counts - sent_before)
+            results[-1]["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(json.dumps(results[-1], indent=2))
+    finally:
+        await main.send_queue.stop()
+        await main.prefetch_pool.stop()
+        await main.close_http_session()
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Meme Master against local upstream stand-ins.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of latency added by the fake upstreams")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Extra random upstream latency, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of upstream requests that fail with 503")
+    parser.add_argument("--requests", type=int, default=2000, help="Calls per request-driven scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--subreddits", type=int, default=20)
+    parser.add_argument("--channels", type=int, default=500, help="Distinct channel IDs used by get_meme and /gif")
+    parser.add_argument("--guilds", type=int, default=100)
+    parser.add_argument("--autopost-channels", type=int, default=1000)
+    parser.add_argument("--autopost-interval", type=float, default=10)
+    parser.add_argument("--autopost-duration", type=float, default=20)
+    parser.add_argument("--send-latency", type=float, default=0.05, help="Seconds a fake Discord send takes")
+    parser.add_argument("--no-tracemalloc", dest="tracemalloc", action="store_false", help="Skip peak memory tracing (it slows every scenario)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+def main_benchmark():
+    args = parse_args()
+    random.seed(args.seed)
+    upstream_thread = UpstreamThread(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    upstreams = upstream_thread.start()
+    try:
+        import_bot(upstreams.base_url)
+        results = asyncio.run(run(args, upstreams))
+    finally:
+        upstream_thread.stop()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "options": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    output = args.output or os.path.join(BENCH_DIR, "results", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+if __name__ == "__main__":
+    main_benchmark()
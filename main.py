@@ -5,21 +5,26 @@ from discord.ui import Button, View
 from discord import Embed
 from discord import app_commands
 import asyncio
-import requests
+import heapq
+import itertools
 from collections import deque
 import os
 import sys
 import time
 import random
-import praw
-import asyncpraw
-import subprocess
+import re
+import json
+import hashlib
 from discord.app_commands import checks
 from datetime import datetime, timedelta
 import aiohttp
 import logging
+import threading
+import traceback
+from abc import ABC, abstractmethod
+from array import array
 from dotenv import load_dotenv
-from collections import deque
+from collections import deque, OrderedDict, Counter
 
 # Set logging level to ERROR to suppress WARNING and INFO messages
 logging.basicConfig(level=logging.ERROR)
@@ -32,37 +37,185 @@ TOKEN = os.getenv("DISCORD_TOKEN")
 CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 
-# Modified Reddit initialization
-try:
-    reddit = praw.Reddit(
-        client_id=CLIENT_ID,
-        client_secret=CLIENT_SECRET,
-        user_agent="Auto Memer",
-        check_for_updates=False,
-        read_only=True,
-        comment_kind=None,
-        message_kind=None,
-        redditor_kind=None,
-        submission_kind=None,
-        subreddit_kind=None,
-        trophy_kind=None,
-        oauth_url=None,
-        ratelimit_seconds=30,  # Changed from None to 30 seconds
-        reddit_url=None,
-        timeout=30
-    )
-except Exception as e:
-    print(f"Warning: Reddit initialization failed: {e}")
-    reddit = None
+def env_int(name, default):
+    return int(os.getenv(name, default))
+
+def env_float(name, default):
+    return float(os.getenv(name, default))
+
+def env_list(name, default):
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+# Upstream endpoints (overridable for local testing)
+REDDIT_BASE_URL = os.getenv("REDDIT_BASE_URL", "https://www.reddit.com")
+JOKEAPI_BASE_URL = os.getenv("JOKEAPI_BASE_URL", "https://v2.jokeapi.dev")
+GIPHY_BASE_URL = os.getenv("GIPHY_BASE_URL", "https://api.giphy.com")
+GIPHY_API_KEY = os.getenv("GIPHY_API_KEY", "upEsZXwiOekDKkRmMwCRpKUHSLz3OXzu")
+USER_AGENT = "Auto Memer"
+
+# Shared HTTP client settings
+HTTP_TIMEOUT = env_float("HTTP_TIMEOUT", 10)  # Total time allowed per request
+HTTP_CONNECT_TIMEOUT = env_float("HTTP_CONNECT_TIMEOUT", 5)
+HTTP_POOL_SIZE = env_int("HTTP_POOL_SIZE", 100)  # Max open connections overall
+HTTP_POOL_PER_HOST = env_int("HTTP_POOL_PER_HOST", 20)  # Max open connections per upstream host
+HTTP_DNS_CACHE_TTL = env_int("HTTP_DNS_CACHE_TTL", 300)
+HTTP_KEEPALIVE_TIMEOUT = env_float("HTTP_KEEPALIVE_TIMEOUT", 60)
+
+# Upstream rate limits: sustained requests per second and burst size per upstream.
+# Rate-limit response headers can lower these at runtime, never raise them.
+REDDIT_RATE_LIMIT = env_float("REDDIT_RATE_LIMIT", 1.5)
+REDDIT_RATE_BURST = env_int("REDDIT_RATE_BURST", 10)
+JOKEAPI_RATE_LIMIT = env_float("JOKEAPI_RATE_LIMIT", 2)
+JOKEAPI_RATE_BURST = env_int("JOKEAPI_RATE_BURST", 5)
+GIPHY_RATE_LIMIT = env_float("GIPHY_RATE_LIMIT", 1)
+GIPHY_RATE_BURST = env_int("GIPHY_RATE_BURST", 5)
+
+# Outbound Discord message queue settings
+SEND_QUEUE_CAPACITY = env_int("SEND_QUEUE_CAPACITY", 5000)  # Queued messages before auto-posts are refused
+SEND_GLOBAL_RATE = env_float("SEND_GLOBAL_RATE", 40)  # Messages per second across all channels (Discord allows 50)
+SEND_CHANNEL_RATE = env_float("SEND_CHANNEL_RATE", 1)  # Sustained messages per second per channel
+SEND_CHANNEL_BURST = env_int("SEND_CHANNEL_BURST", 5)  # Discord allows 5 messages per 5 seconds per channel
+SEND_CONCURRENCY = env_int("SEND_CONCURRENCY", 20)  # Sends in flight at once
+SEND_STALE_AFTER = env_float("SEND_STALE_AFTER", 60)  # Auto-posts still queued after this many seconds are dropped
+
+# Subreddit listing cache settings
+LISTING_CACHE_TTL = env_float("LISTING_CACHE_TTL", 60)  # Seconds a listing counts as fresh
+LISTING_CACHE_STALE_TTL = env_float("LISTING_CACHE_STALE_TTL", 300)  # Extra seconds a stale listing is served while refreshing
+LISTING_CACHE_MAX_SUBREDDITS = env_int("LISTING_CACHE_MAX_SUBREDDITS", 500)
+
+# /gif search cache settings
+GIF_PAGE_SIZE = env_int("GIF_PAGE_SIZE", 25)  # GIFs per Giphy search request (Giphy allows up to 50)
+GIF_CACHE_TTL = env_float("GIF_CACHE_TTL", 3600)  # Seconds a cached result page is reused
+GIF_CACHE_MAX_PAGES = env_int("GIF_CACHE_MAX_PAGES", 2000)  # Result pages kept in memory (least recently used are evicted)
+GIF_CURSOR_MAX = env_int("GIF_CURSOR_MAX", 100000)  # Per-server keyword positions remembered
+GIF_PAGES_PER_REQUEST = env_int("GIF_PAGES_PER_REQUEST", 3)  # Pages one /gif may move through to find an unsent GIF
+
+# /meme_search settings
+MEME_SEARCH_SUBREDDITS = env_list("MEME_SEARCH_SUBREDDITS", "memes,dankmemes,funny")
+MEME_SEARCH_DEADLINE = env_float("MEME_SEARCH_DEADLINE", 5)  # Seconds to wait for all subreddits combined
+
+# Auto-post scheduler settings
+AUTOPOST_BATCH_SIZE = env_int("AUTOPOST_BATCH_SIZE", 100)  # Max channels handed to one dispatch
+AUTOPOST_COALESCE_WINDOW = env_float("AUTOPOST_COALESCE_WINDOW", 2)  # Seconds early a channel may fire to share a fetch
+AUTOPOST_MIN_INTERVAL = env_int("AUTOPOST_MIN_INTERVAL", 30)  # Shortest interval /setchannel accepts, in seconds
+
+# Channel registry settings
+CHANNEL_STORE_BACKEND = os.getenv("CHANNEL_STORE_BACKEND", "sqlite")
+CHANNEL_STORE_PATH = os.getenv("CHANNEL_STORE_PATH", "memebot.db")
+RESUME_JITTER = env_float("RESUME_JITTER", 60)  # Max seconds a restored channel waits before its first post
+
+# Keyword trigger settings
+TRIGGER_KEYWORDS = env_list("TRIGGER_KEYWORDS", "post a meme,send meme")  # Default phrases for servers without their own
+TRIGGER_MAX_KEYWORDS = env_int("TRIGGER_MAX_KEYWORDS", 20)
+TRIGGER_CHANNEL_COOLDOWN = env_float("TRIGGER_CHANNEL_COOLDOWN", 30)  # Seconds between triggered memes in a channel
+TRIGGER_USER_COOLDOWN = env_float("TRIGGER_USER_COOLDOWN", 60)  # Seconds between triggered memes for one user
+
+# Repeat-avoidance settings
+DEDUP_POSTS_PER_CHANNEL = env_int("DEDUP_POSTS_PER_CHANNEL", 100)  # Recent memes remembered per channel
+DEDUP_GIFS_PER_GUILD = env_int("DEDUP_GIFS_PER_GUILD", 200)  # Recent GIFs remembered per server
+DEDUP_JOKES_PER_CHANNEL = env_int("DEDUP_JOKES_PER_CHANNEL", 100)  # Recent jokes remembered per channel
+DEDUP_TTL = env_float("DEDUP_TTL", 86400)  # Seconds before a meme or GIF may repeat anyway
+DEDUP_MAX_SCOPES = env_int("DEDUP_MAX_SCOPES", 100000)  # Channels/servers tracked before the least recent is dropped
+
+# Meme prefetch settings
+PREFETCH_LOW_WATERMARK = env_int("PREFETCH_LOW_WATERMARK", 10)  # Refill a buffer when it drops below this
+PREFETCH_HIGH_WATERMARK = env_int("PREFETCH_HIGH_WATERMARK", 40)  # Stop filling at this many memes
+PREFETCH_MAX_SUBREDDITS = env_int("PREFETCH_MAX_SUBREDDITS", 50)  # Buffers kept for the most recently requested subreddits
+PREFETCH_IDLE_TTL = env_float("PREFETCH_IDLE_TTL", 600)  # Drop a buffer nobody requested for this many seconds
+PREFETCH_RETRY_DELAY = env_float("PREFETCH_RETRY_DELAY", 30)  # First wait after a failed refill; doubles per failure up to PREFETCH_IDLE_TTL
+
+# /top_memes refresh settings
+TOP_SUBREDDITS = env_list("TOP_SUBREDDITS", "memes")  # Subreddits offered by /top_memes (Discord allows 25)
+TOP_LISTING_LIMIT = env_int("TOP_LISTING_LIMIT", 50)  # Posts fetched per top listing (Reddit allows 100)
+TOP_REFRESH_INTERVALS = {  # Seconds between refreshes of each timeframe; older timeframes change more slowly
+    "day": env_float("TOP_REFRESH_DAY", 600),
+    "week": env_float("TOP_REFRESH_WEEK", 3600),
+    "month": env_float("TOP_REFRESH_MONTH", 6 * 3600),
+    "year": env_float("TOP_REFRESH_YEAR", 24 * 3600),
+}
+TOP_RETRY_DELAY = env_float("TOP_RETRY_DELAY", 60)  # Seconds before a failed refresh is retried
+
+# Joke pool settings
+JOKE_POOL_SIZE = env_int("JOKE_POOL_SIZE", 100)  # Jokes kept ready in memory
+JOKE_POOL_LOW_WATERMARK = env_int("JOKE_POOL_LOW_WATERMARK", 30)  # Fetch more when the pool drops below this
+JOKE_BATCH_SIZE = env_int("JOKE_BATCH_SIZE", 10)  # Jokes per JokeAPI request (it allows at most 10)
+JOKE_CORPUS_PATH = os.getenv("JOKE_CORPUS_PATH", "jokes.json")  # Fallback jokes saved on disk; empty disables
+JOKE_CORPUS_MAX = env_int("JOKE_CORPUS_MAX", 1000)  # Jokes kept in the fallback corpus
+JOKE_FETCH_TIMEOUT = env_float("JOKE_FETCH_TIMEOUT", 2)  # Longest a /random_joke waits on JokeAPI when the corpus is empty too
+
+# Metrics endpoint settings
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = env_int("METRICS_PORT", 9100)  # 0 disables the endpoint
+
+# Event loop monitoring settings
+LOOP_PROBE_INTERVAL = env_float("LOOP_PROBE_INTERVAL", 0.5)  # Seconds between lag probes
+LOOP_STALL_THRESHOLD = env_float("LOOP_STALL_THRESHOLD", 0.25)  # Lag (seconds) reported as a stall
+LOOP_STACK_SAMPLING = os.getenv("LOOP_STACK_SAMPLING", "1") == "1"  # Capture what the loop was running during a stall
+LOOP_ASYNCIO_DEBUG = os.getenv("LOOP_ASYNCIO_DEBUG", "0") == "1"  # Also use asyncio's slow-callback report (costly)
+
+# Sharding and cluster settings
+SHARD_COUNT = os.getenv("SHARD_COUNT", "")  # Empty runs one gateway connection; "auto" or a number runs AutoShardedBot
+SHARD_IDS = [int(shard_id) for shard_id in env_list("SHARD_IDS", "")]  # Shards this process connects (default: all)
+CLUSTER_WORKERS = env_int("CLUSTER_WORKERS", 1)  # Above 1, main.py launches this many bot processes instead of a bot
+CLUSTER_WORKER_ID = env_int("CLUSTER_WORKER_ID", -1)  # Set by the launcher for each worker process
+CLUSTER_IPC_HOST = os.getenv("CLUSTER_IPC_HOST", "127.0.0.1")
+CLUSTER_IPC_PORT = env_int("CLUSTER_IPC_PORT", 9200)  # Workers report to the launcher here
+CLUSTER_REPORT_INTERVAL = env_float("CLUSTER_REPORT_INTERVAL", 5)  # Seconds between worker reports
+REFRESH_WORKER = CLUSTER_WORKER_ID <= 0  # Standalone or worker 0: the one process that refreshes top listings and jokes
 
 # Create default intents
 intents = discord.Intents.default()  # Create default intents
 # You can enable specific intents if needed, e.g., intents.message_content = True
 
+class MemeCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction):
+        interaction.extras["started_at"] = time.perf_counter()  # Read back when the command finishes
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error):
+        record_command_latency(interaction, "error")
+        await super().on_error(interaction, error)
+
+class MemeBotLifecycle:
+    # Shared by the single-connection and the sharded bot
+    async def setup_hook(self):
+        # One pooled HTTP client for the whole bot lifetime
+        get_http_session()
+        await load_channel_registry()
+        await load_trigger_keywords()
+        send_queue.start()
+        auto_post_scheduler.start()
+        prefetch_pool.start()
+        top_listings.start()
+        await joke_pool.start()
+        await metrics_server.start()
+        loop_monitor.start()
+        cluster_client.start()
+        prepare_response_templates()
+
+    async def close(self):
+        await cluster_client.stop()
+        loop_monitor.stop()
+        await metrics_server.stop()
+        await prefetch_pool.stop()
+        await top_listings.stop()
+        await auto_post_scheduler.stop()
+        await send_queue.stop()
+        await channel_store.close()
+        await close_http_session()
+        await super().close()
+
+class MemeBot(MemeBotLifecycle, commands.Bot):
+    pass
+
+class ShardedMemeBot(MemeBotLifecycle, commands.AutoShardedBot):
+    pass
+
 # Create the bot with specific intents
-bot = commands.Bot(
+bot_options = dict(
     command_prefix="/", 
     intents=intents,
+    tree_cls=MemeCommandTree,
     chunk_guilds_at_startup=False,  # Disable guild chunking at startup
     heartbeat_timeout=60.0,        # Reduce heartbeat timeout
     guild_ready_timeout=2.0,        # Reduce guild ready timeout
@@ -70,15 +223,28 @@ bot = commands.Bot(
     max_messages=None,                # Disable message cache
     member_cache_flags=discord.MemberCacheFlags.none()  # Minimize member cache
 )
+if SHARD_COUNT:
+    bot = ShardedMemeBot(
+        shard_count=None if SHARD_COUNT == "auto" else int(SHARD_COUNT),  # None asks Discord for the recommended count
+        shard_ids=SHARD_IDS or None,
+        **bot_options
+    )
+else:
+    bot = MemeBot(**bot_options)
+
+def owns_guild(guild_id):
+    # A worker only handles guilds on its own shards; Discord routes a guild to shard (id >> 22) % count
+    if not SHARD_IDS or guild_id is None or not SHARD_COUNT.isdigit():
+        return True
+    return (guild_id >> 22) % int(SHARD_COUNT) in SHARD_IDS
 
 # ===== GLOBAL VARIABLES =====
 active_channels = {}
 stopped_channels = set()
 memes_posted = 0
 meme_command_count = 0
-command_history_list = deque(maxlen=30)
-last_sync_time = None
-SYNC_COOLDOWN = 60
+command_history_list = deque(maxlen=30)  # (timestamp, "/command") so workers' histories can be merged
+synced_command_hash = None  # Hash of the command tree Discord last received from us
 
 # Define your support server channel ID
 SUPPORT_CHANNEL_ID = 1333205807000453150  # Replace with your actual channel ID
@@ -86,8 +252,1210 @@ SUPPORT_CHANNEL_ID = 1333205807000453150  # Replace with your actual channel ID
 # Global variable to store last answers
 last_answers = []
 
-# Global set to keep track of sent GIFs
-sent_gifs = set()
+# ===== METRICS =====
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def format_labels(label_names, label_values):
+    if not label_names:
+        return ""
+    pairs = []
+    for name, value in zip(label_names, label_values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+class CounterMetric:
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values = {}  # label values tuple -> count
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self.values.items():
+            yield f"{self.name}{format_labels(self.label_names, label_values)} {value}"
+
+class HistogramMetric:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.values = {}  # label values tuple -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *label_values):
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-1] += value
+
+    def count(self, *label_values):
+        series = self.values.get(label_values)
+        return sum(series[:-1]) if series else 0
+
+    def quantile(self, q, *label_values):
+        # Upper bound of the bucket holding the q-th observation; good enough for a dashboard
+        series = self.values.get(label_values)
+        total = self.count(*label_values)
+        if not total:
+            return 0.0
+        running = 0
+        for i, bound in enumerate(self.buckets):
+            running += series[i]
+            if running >= q * total:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        for label_values, series in self.values.items():
+            running = 0
+            for i, bound in enumerate(self.buckets + ("+Inf",)):
+                running += series[i]
+                labels = format_labels(self.label_names + ("le",), label_values + (bound,))
+                yield f"{self.name}_bucket{labels} {running}"
+            labels = format_labels(self.label_names, label_values)
+            yield f"{self.name}_sum{labels} {series[-1]}"
+            yield f"{self.name}_count{labels} {running}"
+
+class CallbackMetric:
+    # Read at scrape time from state the bot already keeps. fn returns a number, or a dict
+    # of label values tuple -> number when label_names is set.
+    def __init__(self, name, kind, help_text, fn, label_names=()):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.fn = fn
+        self.label_names = label_names
+
+    def samples(self):
+        value = self.fn()
+        if not self.label_names:
+            yield f"{self.name} {value}"
+            return
+        for label_values, sample in value.items():
+            yield f"{self.name}{format_labels(self.label_names, label_values)} {sample}"
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(CounterMetric(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._register(HistogramMetric(name, help_text, label_names, buckets))
+
+    def gauge(self, name, help_text, fn, label_names=()):
+        return self._register(CallbackMetric(name, "gauge", help_text, fn, label_names))
+
+    def callback_counter(self, name, help_text, fn, label_names=()):
+        return self._register(CallbackMetric(name, "counter", help_text, fn, label_names))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                print(f"Error collecting metric {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+command_latency = metrics.histogram("memebot_command_seconds", "Slash command handling time.", ("command", "outcome"))
+upstream_latency = metrics.histogram("memebot_upstream_request_seconds", "Upstream HTTP request time.", ("upstream", "outcome"))
+get_meme_latency = metrics.histogram("memebot_get_meme_seconds", "Time for get_meme to return a meme.", ("source",))
+get_joke_latency = metrics.histogram("memebot_get_joke_seconds", "Time for get_joke to return a joke.", ("source",))
+send_latency = metrics.histogram("memebot_discord_send_seconds", "Time for one Discord channel.send call.", ("outcome",))
+send_queue_wait = metrics.histogram("memebot_send_queue_wait_seconds", "Time a message waited in the send queue.", ("priority",))
+
+def record_command_latency(interaction, outcome):
+    started_at = interaction.extras.get("started_at")
+    if started_at is None or interaction.command is None:
+        return
+    command_latency.observe(time.perf_counter() - started_at, interaction.command.qualified_name, outcome)
+
+class MetricsServer:
+    # Serves GET /metrics in Prometheus text format from the bot's own event loop
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def handle_metrics(self, request):
+        from aiohttp import web
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self):
+        if not self.port or self.runner is not None:
+            return
+        from aiohttp import web  # The server half of aiohttp only loads when the endpoint is enabled
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        try:
+            await web.TCPSite(self.runner, self.host, self.port).start()
+        except OSError as e:
+            print(f"Could not start metrics endpoint on {self.host}:{self.port}: {e}")
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+metrics_server = MetricsServer(METRICS_HOST, METRICS_PORT)
+
+# ===== EVENT LOOP MONITORING =====
+class SlowCallbackHandler(logging.Handler):
+    # Receives asyncio's "Executing <Handle ...> took 0.300 seconds" warnings in debug mode
+    def __init__(self, monitor):
+        super().__init__(level=logging.WARNING)
+        self.monitor = monitor
+
+    def emit(self, record):
+        message = record.getMessage()
+        if message.startswith("Executing "):
+            self.monitor.slow_callbacks.append((datetime.now(), message))
+
+class LoopMonitor:
+    # A probe task measures how late its own sleeps wake up. A watchdog thread notices when
+    # the probe stops ticking and samples the loop thread's stack while it is still stuck.
+    def __init__(self, interval, threshold, sample_stacks, asyncio_debug, history=20):
+        self.interval = interval
+        self.threshold = threshold
+        self.sample_stacks = sample_stacks
+        self.asyncio_debug = asyncio_debug
+        self.stalls = deque(maxlen=history)  # (when, lag seconds, stack text or None)
+        self.slow_callbacks = deque(maxlen=history)  # (when, asyncio message)
+        self.stall_count = 0
+        self.max_lag = 0.0
+        self.last_tick = time.monotonic()
+        self.pending_stack = None
+        self.loop_thread_id = None
+        self.probe_task = None
+        self.watchdog = None
+        self.stopping = threading.Event()
+
+    async def probe(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.last_tick = now
+            lag = max(0.0, now - expected)
+            loop_lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self.stall_count += 1
+                self.stalls.append((datetime.now(), lag, self.pending_stack))
+            self.pending_stack = None
+
+    def watch(self):
+        # Runs in its own thread; only reads timestamps and, during a stall, one stack
+        sampled_tick = None
+        while not self.stopping.wait(self.threshold / 2):
+            last_tick = self.last_tick
+            if time.monotonic() - last_tick < self.interval + self.threshold or sampled_tick == last_tick:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is not None:
+                self.pending_stack = "".join(traceback.format_stack(frame, limit=15))
+                sampled_tick = last_tick
+
+    def start(self):
+        if self.probe_task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.last_tick = time.monotonic()
+        self.probe_task = asyncio.create_task(self.probe())
+        if self.sample_stacks:
+            self.stopping.clear()
+            self.watchdog = threading.Thread(target=self.watch, name="loop-watchdog", daemon=True)
+            self.watchdog.start()
+        if self.asyncio_debug:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.threshold
+            asyncio_logger = logging.getLogger("asyncio")
+            asyncio_logger.setLevel(logging.WARNING)  # Root logger is at ERROR, which would drop the reports
+            asyncio_logger.addHandler(SlowCallbackHandler(self))
+
+    def stop(self):
+        self.stopping.set()
+        if self.probe_task is not None:
+            self.probe_task.cancel()
+            self.probe_task = None
+
+loop_lag = metrics.histogram("memebot_event_loop_lag_seconds", "How late the event loop woke a sleeping task.", ())
+loop_monitor = LoopMonitor(LOOP_PROBE_INTERVAL, LOOP_STALL_THRESHOLD, LOOP_STACK_SAMPLING, LOOP_ASYNCIO_DEBUG)
+
+# ===== UPSTREAM RATE LIMITING =====
+# Lower values are served first when an upstream is saturated
+PRIORITY_INTERACTIVE = 0  # Slash commands, buttons and keyword triggers
+PRIORITY_AUTOPOST = 1
+PRIORITY_PREFETCH = 2  # Background refreshes and buffer refills
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def delay(self, now):
+        # Seconds until a token is available (0 if one is available now)
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+class UpstreamRateLimiter:
+    # Token bucket per upstream. Callers that can't get a token right away queue by
+    # priority and are released by a single pump task as tokens become available.
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.rate = rate
+        self.bucket = TokenBucket(rate, burst)
+        self.blocked_until = 0.0
+        self.waiters = []  # (priority, seq, future)
+        self.seq = itertools.count()
+        self.pump = None
+        self.acquired = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _delay(self, now):
+        # Seconds until a token can be handed out
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return self.bucket.delay(now)
+
+    async def acquire(self, priority=PRIORITY_INTERACTIVE):
+        started = time.monotonic()
+        if not self.waiters and self._delay(started) == 0:
+            self.bucket.take()
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiters, (priority, next(self.seq), future))
+            self.queued += 1
+            if self.pump is None or self.pump.done():
+                self.pump = asyncio.create_task(self._run_pump())
+            await future
+        waited = time.monotonic() - started
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    async def _run_pump(self):
+        while self.waiters:
+            delay = self._delay(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self.waiters)
+            if future.done():
+                continue  # Caller was cancelled while queued
+            self.bucket.take()
+            future.set_result(None)
+
+    def observe(self, status, headers):
+        # Reddit sends X-Ratelimit-*, others the IETF RateLimit-* draft; Retry-After comes with 429s
+        now = time.monotonic()
+        remaining = headers.get("X-Ratelimit-Remaining") or headers.get("RateLimit-Remaining")
+        reset = headers.get("X-Ratelimit-Reset") or headers.get("RateLimit-Reset")
+        try:
+            if status == 429:
+                retry_after = float(headers.get("Retry-After") or reset or 60)
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            elif remaining is not None and reset is not None:
+                remaining = float(remaining)
+                reset = float(reset)
+                if reset > 1e9:
+                    reset = max(0.0, reset - time.time())  # Absolute timestamp rather than seconds left
+                if remaining < 1:
+                    self.blocked_until = max(self.blocked_until, now + reset)
+                # Never pace faster than the headers allow for the rest of the window
+                server_rate = max(remaining, 1) / reset if reset > 0 else self.rate
+                self.bucket.rate = min(self.rate, server_rate)
+        except ValueError:
+            pass
+
+    def queue_depth(self):
+        return sum(1 for _, _, future in self.waiters if not future.done())
+
+    def average_wait(self):
+        return self.total_wait / self.acquired if self.acquired else 0.0
+
+upstream_limiters = {
+    "reddit": UpstreamRateLimiter("reddit", REDDIT_RATE_LIMIT, REDDIT_RATE_BURST),
+    "jokeapi": UpstreamRateLimiter("jokeapi", JOKEAPI_RATE_LIMIT, JOKEAPI_RATE_BURST),
+    "giphy": UpstreamRateLimiter("giphy", GIPHY_RATE_LIMIT, GIPHY_RATE_BURST),
+}
+
+# ===== OUTBOUND MESSAGE QUEUE =====
+class SendJob:
+    __slots__ = ("channel", "args", "kwargs", "priority", "deadline", "future", "queued_at")
+
+    def __init__(self, channel, args, kwargs, priority, deadline, future):
+        self.queued_at = time.monotonic()
+        self.channel = channel
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.deadline = deadline
+        self.future = future
+
+class SendQueue:
+    # All channel.send calls go through here. Each channel has a FIFO of jobs and its own
+    # token bucket; a global bucket keeps the total under Discord's global rate limit.
+    # Channels with pending jobs sit in one heap per priority, ordered by when they may send
+    # next; a due channel in a more urgent heap always goes first, and interactive jobs jump
+    # ahead of auto-posts in their channel's FIFO.
+    def __init__(self, capacity, global_rate, channel_rate, channel_burst, concurrency):
+        self.capacity = capacity
+        self.global_bucket = TokenBucket(global_rate, max(1, int(global_rate)))
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.channel_buckets = OrderedDict()  # channel_id -> TokenBucket, least recently used first
+        self.pending = {}  # channel_id -> deque of SendJob
+        self.ready = {}  # priority of the channel's first job -> heap of (ready_at, seq, channel_id)
+        self.scheduled = {}  # channel_id -> (ready_at, seq) of its live heap entry; older entries are skipped
+        self.seq = itertools.count()
+        self.size = 0
+        self.slots = asyncio.Semaphore(concurrency)
+        self.wakeup = asyncio.Event()
+        self.runner = None
+        self.in_flight = set()
+        self.sent = 0
+        self.failed = 0
+        self.dropped_stale = 0
+        self.rejected = 0
+
+    def saturated(self):
+        return self.size >= self.capacity * 0.8
+
+    def submit(self, channel, *args, priority=PRIORITY_INTERACTIVE, stale_after=None, **kwargs):
+        # Returns a future resolving to the sent message, or to None if the job was dropped.
+        # Auto-posts are refused outright when the queue is full; interactive replies never are.
+        future = asyncio.get_running_loop().create_future()
+        if self.size >= self.capacity and priority != PRIORITY_INTERACTIVE:
+            self.rejected += 1
+            future.set_result(None)
+            return future
+
+        self.start()
+        deadline = time.monotonic() + stale_after if stale_after is not None else None
+        job = SendJob(channel, args, kwargs, priority, deadline, future)
+        jobs = self.pending.get(channel.id)
+        if jobs is None:
+            jobs = self.pending[channel.id] = deque([job])
+            self._schedule(channel.id, time.monotonic())
+            self.wakeup.set()
+        else:
+            # Behind jobs of the same or a more urgent priority, ahead of the rest
+            position = next((i for i, queued in enumerate(jobs) if queued.priority > priority), len(jobs))
+            jobs.insert(position, job)
+            if position == 0:
+                self._schedule(channel.id, self.scheduled[channel.id][0])  # Move the channel to the more urgent heap
+                self.wakeup.set()
+        self.size += 1
+        return future
+
+    async def send(self, channel, *args, **kwargs):
+        return await self.submit(channel, *args, **kwargs)
+
+    def _channel_bucket(self, channel_id):
+        bucket = self.channel_buckets.get(channel_id)
+        if bucket is None:
+            bucket = self.channel_buckets[channel_id] = TokenBucket(self.channel_rate, self.channel_burst)
+            if len(self.channel_buckets) > self.capacity + len(self.pending):
+                self.channel_buckets.popitem(last=False)
+        else:
+            self.channel_buckets.move_to_end(channel_id)
+        return bucket
+
+    def _schedule(self, channel_id, ready_at):
+        seq = next(self.seq)
+        self.scheduled[channel_id] = (ready_at, seq)
+        heapq.heappush(self.ready.setdefault(self.pending[channel_id][0].priority, []), (ready_at, seq, channel_id))
+
+    def _requeue(self, channel_id, ready_at):
+        if self.pending[channel_id]:
+            self._schedule(channel_id, ready_at)
+        else:
+            del self.pending[channel_id]
+            del self.scheduled[channel_id]
+
+    def _next_ready(self, now):
+        # Returns (heap of the most urgent due channel or None, earliest ready_at or None)
+        earliest = None
+        for priority in sorted(self.ready):
+            heap = self.ready[priority]
+            while heap and self.scheduled.get(heap[0][2], (None, None))[1] != heap[0][1]:
+                heapq.heappop(heap)  # Superseded when the channel moved heaps
+            if not heap:
+                continue
+            if heap[0][0] <= now:
+                return heap, heap[0][0]
+            earliest = heap[0][0] if earliest is None else min(earliest, heap[0][0])
+        return None, earliest
+
+    async def _deliver(self, job):
+        started_at = time.monotonic()
+        send_queue_wait.observe(started_at - job.queued_at, job.priority)
+        try:
+            message = await job.channel.send(*job.args, **job.kwargs)
+            self.sent += 1
+            send_latency.observe(time.monotonic() - started_at, "ok")
+            if not job.future.done():
+                job.future.set_result(message)
+        except Exception as e:
+            self.failed += 1
+            send_latency.observe(time.monotonic() - started_at, "error")
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            self.slots.release()
+
+    async def run(self):
+        while True:
+            now = time.monotonic()
+            heap, ready_at = self._next_ready(now)
+            if ready_at is None:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            delay = max(ready_at - now, self.global_bucket.delay(now))
+            if delay > 0:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, channel_id = heapq.heappop(heap)
+            jobs = self.pending[channel_id]
+            job = jobs[0]
+            if job.future.done() or (job.deadline is not None and now > job.deadline):
+                # Caller gave up, or a stale auto-post nobody wants anymore
+                jobs.popleft()
+                self.size -= 1
+                if not job.future.done():
+                    self.dropped_stale += 1
+                    job.future.set_result(None)
+                self._requeue(channel_id, now)
+                continue
+
+            bucket = self._channel_bucket(channel_id)
+            channel_delay = bucket.delay(now)
+            if channel_delay > 0:
+                self._requeue(channel_id, now + channel_delay)
+                continue
+
+            jobs.popleft()
+            self.size -= 1
+            bucket.take()
+            self.global_bucket.take()
+            self._requeue(channel_id, now)
+            await self.slots.acquire()
+            task = asyncio.create_task(self._deliver(job))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+
+    def start(self):
+        if self.runner is None:
+            self.runner = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.runner is not None:
+            self.runner.cancel()
+            self.runner = None
+        for task in list(self.in_flight):
+            task.cancel()
+
+send_queue = SendQueue(SEND_QUEUE_CAPACITY, SEND_GLOBAL_RATE, SEND_CHANNEL_RATE, SEND_CHANNEL_BURST, SEND_CONCURRENCY)
+
+# ===== HTTP CLIENT =====
+http_session = None
+
+def create_http_session():
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_SIZE,
+        limit_per_host=HTTP_POOL_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        use_dns_cache=True,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+    )
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        headers={"User-Agent": USER_AGENT}
+    )
+
+def get_http_session():
+    # Created in setup_hook; lazily recreated if used before startup or after close
+    global http_session
+    if http_session is None or http_session.closed:
+        http_session = create_http_session()
+    return http_session
+
+async def close_http_session():
+    global http_session
+    if http_session is not None and not http_session.closed:
+        await http_session.close()
+    http_session = None
+
+upstream_request_counts = Counter()  # upstream name -> requests sent
+
+async def fetch_json(upstream, url, params=None, priority=PRIORITY_INTERACTIVE):
+    limiter = upstream_limiters.get(upstream)
+    if limiter is not None:
+        await limiter.acquire(priority)
+    upstream_request_counts[upstream] += 1
+    session = get_http_session()
+    started_at = time.perf_counter()
+    outcome = "error"
+    try:
+        async with session.get(url, params=params) as response:
+            if limiter is not None:
+                limiter.observe(response.status, response.headers)
+            outcome = str(response.status)
+            response.raise_for_status()
+            return await response.json(content_type=None)
+    finally:
+        upstream_latency.observe(time.perf_counter() - started_at, upstream, outcome)
+
+# ===== BACKGROUND TASKS =====
+background_tasks = set()
+
+def spawn_background(coro):
+    # Keep a reference so fire-and-forget tasks aren't garbage collected mid-run
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# ===== REPEAT AVOIDANCE =====
+class RecentSet:
+    # Remembers at most max_items keys, each for at most ttl seconds. Keys are stored as
+    # 64-bit hashes in a ring buffer (12 bytes per entry) and looked up with a C-level scan.
+    __slots__ = ("hashes", "added", "next_slot", "max_items", "ttl")
+
+    def __init__(self, max_items, ttl):
+        self.hashes = array("q")
+        self.added = array("I")  # Whole seconds on the monotonic clock
+        self.next_slot = 0
+        self.max_items = max_items
+        self.ttl = ttl
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, key):
+        try:
+            slot = self.hashes.index(hash(key))
+        except ValueError:
+            return False
+        return time.monotonic() - self.added[slot] <= self.ttl
+
+    def add(self, key):
+        # Returns True when the set grew by one entry
+        key_hash = hash(key)
+        now = int(time.monotonic())
+        try:
+            self.added[self.hashes.index(key_hash)] = now
+            return False
+        except ValueError:
+            pass
+        if len(self.hashes) < self.max_items:
+            self.hashes.append(key_hash)
+            self.added.append(now)
+            return True
+        # Full: overwrite the oldest entry
+        self.hashes[self.next_slot] = key_hash
+        self.added[self.next_slot] = now
+        self.next_slot = (self.next_slot + 1) % self.max_items
+        return False
+
+EMPTY_RECENT_SET_BYTES = sys.getsizeof(RecentSet(0, 0)) + sys.getsizeof(array("q")) + sys.getsizeof(array("I"))
+RECENT_SET_ENTRY_BYTES = array("q").itemsize + array("I").itemsize
+
+class DedupRegistry:
+    # One RecentSet per scope (a channel or a server); the least recently used scopes are
+    # dropped past max_scopes, so memory is capped at roughly max_scopes * max_items keys
+    def __init__(self, max_items, ttl, max_scopes):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_scopes = max_scopes
+        self.scopes = OrderedDict()
+        self.entries = 0  # Kept up to date on add and eviction so /stats and scrapes don't walk every scope
+
+    def seen(self, scope, key):
+        recent = self.scopes.get(scope)
+        return recent is not None and key in recent
+
+    def add(self, scope, key):
+        recent = self.scopes.get(scope)
+        if recent is None:
+            recent = self.scopes[scope] = RecentSet(self.max_items, self.ttl)
+            while len(self.scopes) > self.max_scopes:
+                _, evicted = self.scopes.popitem(last=False)
+                self.entries -= len(evicted)
+        else:
+            self.scopes.move_to_end(scope)
+        if recent.add(key):
+            self.entries += 1
+
+    def clear(self):
+        self.scopes.clear()
+        self.entries = 0
+
+    def entry_count(self):
+        return self.entries
+
+    def memory_bytes(self):
+        # Estimated from the counts; array over-allocation is not included
+        return (
+            sys.getsizeof(self.scopes)
+            + len(self.scopes) * EMPTY_RECENT_SET_BYTES
+            + self.entries * RECENT_SET_ENTRY_BYTES
+        )
+
+post_history = DedupRegistry(DEDUP_POSTS_PER_CHANNEL, DEDUP_TTL, DEDUP_MAX_SCOPES)
+gif_history = DedupRegistry(DEDUP_GIFS_PER_GUILD, DEDUP_TTL, DEDUP_MAX_SCOPES)
+joke_history = DedupRegistry(DEDUP_JOKES_PER_CHANNEL, DEDUP_TTL, DEDUP_MAX_SCOPES)
+
+def pick_unseen_post(posts, channel_id=None, exclude=()):
+    # Prefer posts the channel hasn't had recently; repeat only when the listing is exhausted
+    candidates = [post for post in posts if post['id'] not in exclude and not post_history.seen(channel_id, post['id'])]
+    if not candidates:
+        candidates = [post for post in posts if post['id'] not in exclude] or posts
+    post = random.choice(candidates)
+    if channel_id is not None:
+        post_history.add(channel_id, post['id'])
+    return post
+
+# ===== REQUEST COALESCING =====
+class SingleFlight:
+    # Concurrent callers with the same key share one in-flight fetch (and its result or error)
+    def __init__(self):
+        self.in_flight = {}
+        self.coalesced = 0
+
+    def _forget(self, key, task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Mark the error as retrieved even if every caller went away
+
+    async def do(self, key, coro_fn):
+        task = self.in_flight.get(key)
+        if task is None:
+            # Run as its own task so one caller timing out doesn't cancel the fetch for the rest
+            task = asyncio.create_task(coro_fn())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+listing_flights = SingleFlight()
+
+async def fetch_listing(subreddit_name, listing="hot", priority=PRIORITY_INTERACTIVE, **params):
+    # listing is one of hot/top/new/search; returns the raw post dicts.
+    # Coalesced callers share the first caller's priority.
+    key = (subreddit_name.lower(), listing, tuple(sorted(params.items())))
+
+    async def fetch():
+        data = await fetch_json("reddit", f"{REDDIT_BASE_URL}/r/{subreddit_name}/{listing}.json", params=params, priority=priority)
+        return [post['data'] for post in data['data']['children']]
+
+    return await listing_flights.do(key, fetch)
+
+# ===== LISTING CACHE =====
+class ListingCache:
+    def __init__(self, ttl, stale_ttl, max_entries):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (fetched_at, posts), least recently used first
+        self.refreshing = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        # Returns (posts, is_stale); posts is None when nothing usable is cached
+        entry = self.entries.get(key)
+        if entry is None:
+            return None, False
+        age = time.monotonic() - entry[0]
+        if age > self.ttl + self.stale_ttl:
+            del self.entries[key]
+            return None, False
+        self.entries.move_to_end(key)
+        return entry[1], age > self.ttl
+
+    def set(self, key, posts):
+        self.entries[key] = (time.monotonic(), posts)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+listing_cache = ListingCache(LISTING_CACHE_TTL, LISTING_CACHE_STALE_TTL, LISTING_CACHE_MAX_SUBREDDITS)
+autopost_listing_fetches = 0  # Listing fetches the auto-poster caused (misses and background refreshes)
+
+async def fetch_hot_posts(subreddit_name, priority=PRIORITY_INTERACTIVE):
+    posts = await fetch_listing(subreddit_name, "hot", priority=priority, limit=50)
+    posts = [post for post in posts if post['url'].endswith(("jpg", "jpeg", "png", "gif"))]
+    listing_cache.set(subreddit_name, posts)
+    return posts
+
+async def refresh_hot_posts(subreddit_name):
+    try:
+        await fetch_hot_posts(subreddit_name, PRIORITY_PREFETCH)
+    except Exception as e:
+        print(f"Error refreshing r/{subreddit_name}: {e}")
+    finally:
+        listing_cache.refreshing.discard(subreddit_name)
+
+async def get_hot_posts(subreddit_name, priority=PRIORITY_INTERACTIVE):
+    global autopost_listing_fetches
+    subreddit_name = subreddit_name.lower()
+    posts, is_stale = listing_cache.get(subreddit_name)
+    if posts is None:
+        listing_cache.misses += 1
+        if priority == PRIORITY_AUTOPOST:
+            autopost_listing_fetches += 1
+        return await fetch_hot_posts(subreddit_name, priority)
+
+    if is_stale:
+        # Serve the stale listing now and refresh it in the background
+        listing_cache.stale_hits += 1
+        if subreddit_name not in listing_cache.refreshing:
+            listing_cache.refreshing.add(subreddit_name)
+            if priority == PRIORITY_AUTOPOST:
+                autopost_listing_fetches += 1
+            spawn_background(refresh_hot_posts(subreddit_name))
+    else:
+        listing_cache.hits += 1
+    return posts
+
+# ===== MEME PREFETCH =====
+class PrefetchPool:
+    # Per-subreddit buffers of ready-to-send posts so get_meme is a queue pop. A buffer is
+    # created on first request, refilled in the background below the low watermark up to
+    # the high watermark, and dropped once its subreddit goes unrequested.
+    def __init__(self, low_watermark, high_watermark, max_subreddits, idle_ttl, retry_delay):
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.max_subreddits = max_subreddits
+        self.idle_ttl = idle_ttl
+        self.retry_delay = retry_delay
+        self.buffers = OrderedDict()  # subreddit -> deque of posts, least recently requested first
+        self.last_requested = {}
+        self.refilling = set()
+        self.failed = {}  # subreddit -> (consecutive failed refills, monotonic time of the next try)
+        self.hits = 0
+        self.misses = 0
+        self.janitor = None
+
+    def pop(self, subreddit_name, channel_id=None):
+        subreddit_name = subreddit_name.lower()
+        self.last_requested[subreddit_name] = time.monotonic()
+        buffer = self.buffers.get(subreddit_name)
+        if buffer is None:
+            buffer = self.buffers[subreddit_name] = deque()
+            while len(self.buffers) > self.max_subreddits:
+                evicted, _ = self.buffers.popitem(last=False)
+                self.last_requested.pop(evicted, None)
+                self.failed.pop(evicted, None)
+        else:
+            self.buffers.move_to_end(subreddit_name)
+
+        post = None
+        for candidate in buffer:
+            if not post_history.seen(channel_id, candidate['id']):
+                post = candidate
+                break
+        if post is not None:
+            buffer.remove(post)
+            if channel_id is not None:
+                post_history.add(channel_id, post['id'])
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        if len(buffer) < self.low_watermark:
+            self.schedule_refill(subreddit_name)
+        return post
+
+    def schedule_refill(self, subreddit_name):
+        failed = self.failed.get(subreddit_name)
+        if failed is not None and time.monotonic() < failed[1]:
+            return  # Backing off, e.g. a misspelled or banned subreddit
+        if subreddit_name not in self.refilling:
+            self.refilling.add(subreddit_name)
+            spawn_background(self.refill(subreddit_name))
+
+    async def refill(self, subreddit_name):
+        try:
+            posts = await get_hot_posts(subreddit_name, PRIORITY_PREFETCH)
+            buffer = self.buffers.get(subreddit_name)
+            if buffer is None:
+                return  # Evicted while fetching
+            buffered = {post['id'] for post in buffer}
+            fresh = [post for post in posts if post['id'] not in buffered]
+            random.shuffle(fresh)
+            buffer.extend(fresh[:max(0, self.high_watermark - len(buffer))])
+            self.failed.pop(subreddit_name, None)
+        except Exception as e:
+            failures = self.failed.get(subreddit_name, (0, 0))[0] + 1
+            delay = min(self.retry_delay * 2 ** (failures - 1), self.idle_ttl)
+            self.failed[subreddit_name] = (failures, time.monotonic() + delay)
+            print(f"Error prefetching r/{subreddit_name} (retrying in {delay:.0f} s): {e}")
+        finally:
+            self.refilling.discard(subreddit_name)
+
+    def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_ttl
+        for subreddit_name in [name for name, last in self.last_requested.items() if last < cutoff]:
+            self.buffers.pop(subreddit_name, None)
+            del self.last_requested[subreddit_name]
+            self.failed.pop(subreddit_name, None)
+
+    async def run_janitor(self, period=30):
+        while True:
+            await asyncio.sleep(period)
+            self.evict_idle()
+            for subreddit_name, buffer in self.buffers.items():
+                if len(buffer) < self.low_watermark:
+                    self.schedule_refill(subreddit_name)
+
+    def start(self):
+        if self.janitor is None:
+            self.janitor = asyncio.create_task(self.run_janitor())
+
+    async def stop(self):
+        if self.janitor is not None:
+            self.janitor.cancel()
+            self.janitor = None
+
+prefetch_pool = PrefetchPool(PREFETCH_LOW_WATERMARK, PREFETCH_HIGH_WATERMARK, PREFETCH_MAX_SUBREDDITS, PREFETCH_IDLE_TTL, PREFETCH_RETRY_DELAY)
+
+# ===== TOP LISTINGS =====
+class TopListings:
+    # Top posts for every configured subreddit and timeframe, kept warm by one background task
+    # so /top_memes never waits on Reddit. Each timeframe has its own refresh interval; a
+    # failed refresh keeps serving the previous listing and is retried sooner. In a cluster
+    # only one worker refreshes; it publishes the listings to the channel store and the other
+    # workers read them from there.
+    def __init__(self, subreddits, intervals, limit, retry_delay, fetches=True):
+        self.subreddits = [name.lower() for name in subreddits]
+        self.intervals = intervals  # timeframe -> seconds between refreshes
+        self.limit = limit
+        self.retry_delay = retry_delay
+        self.fetches = fetches
+        self.entries = {}  # (subreddit, timeframe) -> (fetched_at, image posts)
+        self.refreshes = 0
+        self.failures = 0
+        self.hits = 0
+        self.misses = 0
+        self.refresher = None
+
+    async def fetch(self, subreddit_name, timeframe, priority):
+        # Same key as every other fetch of this listing, so a cold /top_memes joins the refresher's request
+        posts = await fetch_listing(subreddit_name, "top", priority=priority, t=timeframe, limit=self.limit)
+        posts = [post for post in posts if post['url'].endswith(("jpg", "jpeg", "png", "gif"))]
+        self.entries[(subreddit_name, timeframe)] = (time.monotonic(), posts)
+        return posts
+
+    async def get(self, subreddit_name, timeframe):
+        subreddit_name = subreddit_name.lower()
+        entry = self.entries.get((subreddit_name, timeframe))
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        # Not warmed yet (just started, or the first refresh failed)
+        self.misses += 1
+        return await self.fetch(subreddit_name, timeframe, PRIORITY_INTERACTIVE)
+
+    async def refresh(self, subreddit_name, timeframe):
+        # Returns seconds until this listing should be refreshed again
+        try:
+            posts = await self.fetch(subreddit_name, timeframe, PRIORITY_PREFETCH)
+            self.refreshes += 1
+            if cluster_client.enabled:
+                await self.publish(subreddit_name, timeframe, posts)
+            return self.intervals[timeframe]
+        except Exception as e:
+            self.failures += 1
+            print(f"Error refreshing top {timeframe} of r/{subreddit_name}: {e}")
+            return min(self.retry_delay, self.intervals[timeframe])
+
+    async def run_refresher(self):
+        due = {(name, timeframe): 0 for name in self.subreddits for timeframe in self.intervals}
+        while True:
+            now = time.monotonic()
+            keys = [key for key, at in due.items() if at <= now]
+            delays = await asyncio.gather(*(self.refresh(*key) for key in keys))
+            for key, delay in zip(keys, delays):
+                due[key] = now + delay
+            await asyncio.sleep(max(0, min(due.values()) - time.monotonic()))
+
+    async def publish(self, subreddit_name, timeframe, posts):
+        # Only the fields /top_memes shows, for the ten posts it can show
+        trimmed = [{field: post[field] for field in ("id", "title", "url", "score", "num_comments")} for post in posts[:10]]
+        await channel_store.save_setting(f"top:{subreddit_name}:{timeframe}", {"fetched_at": time.time(), "posts": trimmed})
+
+    async def run_follower(self):
+        # Another worker refreshes; pick up what it published every retry_delay seconds
+        while True:
+            try:
+                published = await channel_store.load_settings("top:")
+            except Exception as e:
+                print(f"Error loading top listings: {e}")
+                published = {}
+            for key, value in published.items():
+                _, subreddit_name, timeframe = key.split(":", 2)
+                fetched_at = time.monotonic() - max(0, time.time() - value["fetched_at"])
+                self.entries[(subreddit_name, timeframe)] = (fetched_at, value["posts"])
+            await asyncio.sleep(self.retry_delay)
+
+    def ages(self):
+        # timeframe -> seconds since its oldest cached listing was fetched
+        oldest = {}
+        for (_, timeframe), (fetched_at, _) in self.entries.items():
+            oldest[timeframe] = min(fetched_at, oldest.get(timeframe, fetched_at))
+        now = time.monotonic()
+        return {timeframe: now - fetched_at for timeframe, fetched_at in oldest.items()}
+
+    def start(self):
+        if self.refresher is None and self.subreddits:
+            self.refresher = asyncio.create_task(self.run_refresher() if self.fetches else self.run_follower())
+
+    async def stop(self):
+        if self.refresher is not None:
+            self.refresher.cancel()
+            self.refresher = None
+
+top_listings = TopListings(TOP_SUBREDDITS[:25], TOP_REFRESH_INTERVALS, TOP_LISTING_LIMIT, TOP_RETRY_DELAY, fetches=REFRESH_WORKER)
+
+# ===== JOKE POOL =====
+def parse_joke(joke_data):
+    if joke_data["type"] == "twopart":
+        return {"id": joke_data["id"], "setup": joke_data["setup"], "delivery": joke_data["delivery"]}
+    return {"id": joke_data["id"], "setup": joke_data["joke"], "delivery": None}  # For single-part jokes
+
+class JokePool:
+    # Jokes fetched from JokeAPI in batches and served from memory, deduplicated by joke id.
+    # The pool is topped up in the background below the low watermark. Every fetched joke is
+    # also kept in a bounded on-disk corpus, which answers whenever the pool has nothing new,
+    # so a slow JokeAPI never holds up an interaction.
+    # In a cluster only one worker refills from JokeAPI; the others take new jokes from the
+    # corpus it saves.
+    def __init__(self, max_size, low_watermark, batch_size, corpus_path, corpus_max, fetch_timeout, fetches=True):
+        self.max_size = max_size
+        self.low_watermark = low_watermark
+        self.batch_size = batch_size
+        self.corpus_path = corpus_path
+        self.corpus_max = corpus_max
+        self.fetch_timeout = fetch_timeout
+        self.fetches = fetches
+        self.corpus_loaded_at = 0
+        self.jokes = OrderedDict()  # joke id -> joke, oldest first
+        self.corpus = OrderedDict()  # joke id -> joke, least recently fetched first
+        self.corpus_lock = asyncio.Lock()
+        self.flights = SingleFlight()
+        self.refilling = False
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    async def fetch_batch(self, priority):
+        # amount= returns up to batch_size jokes in one request, often with repeats
+        data = await fetch_json(
+            "jokeapi",
+            f"{JOKEAPI_BASE_URL}/joke/Programming,Miscellaneous",
+            params={"type": "twopart", "amount": self.batch_size},
+            priority=priority
+        )
+        jokes = [parse_joke(joke_data) for joke_data in data.get("jokes", [data])]
+        added = 0
+        for joke in jokes:
+            if joke["id"] not in self.jokes:
+                self.jokes[joke["id"]] = joke
+                added += 1
+        while len(self.jokes) > self.max_size:
+            self.jokes.popitem(last=False)
+        await self.remember(jokes)
+        return added
+
+    async def refill(self):
+        try:
+            if not self.fetches:
+                await self.take_from_corpus()
+                return
+            # Batches overlap more as the pool fills; stop once one brings nothing new
+            for _ in range(max(1, (self.max_size - len(self.jokes)) // self.batch_size) + 2):
+                if len(self.jokes) >= self.max_size:
+                    break
+                if not await self.flights.do("batch", lambda: self.fetch_batch(PRIORITY_PREFETCH)):
+                    break
+        except Exception as e:
+            print(f"Error prefetching jokes: {e}")
+        finally:
+            self.refilling = False
+
+    def schedule_refill(self):
+        if not self.refilling:
+            self.refilling = True
+            spawn_background(self.refill())
+
+    def pop(self, channel_id):
+        for joke_id in self.jokes:
+            if not joke_history.seen(channel_id, joke_id):
+                return self.jokes.pop(joke_id)
+        return None
+
+    async def get(self, channel_id=None):
+        # Returns (joke or None, source); source is pool, corpus, fetch, or error when there is no joke
+        joke = self.pop(channel_id)
+        source = "pool"
+        if joke is None:
+            # Nothing new for this channel in memory; answer from the corpus and refill behind it
+            self.misses += 1
+            joke = self.from_corpus(channel_id)
+            source = "corpus"
+            if joke is not None:
+                self.fallbacks += 1
+            else:
+                source = "fetch"
+                # Nothing saved yet either (first run); wait briefly for a fresh batch
+                try:
+                    await asyncio.wait_for(
+                        self.flights.do("batch", lambda: self.fetch_batch(PRIORITY_INTERACTIVE)), self.fetch_timeout
+                    )
+                    # Concurrent misses share the batch; whoever is left over takes it from the corpus
+                    joke = self.pop(channel_id) or self.from_corpus(channel_id)
+                except asyncio.TimeoutError:
+                    print(f"JokeAPI did not answer within {self.fetch_timeout} s")
+                except Exception as e:
+                    print(f"Error fetching jokes: {e}")
+            self.schedule_refill()
+        else:
+            self.hits += 1
+            if len(self.jokes) < self.low_watermark:
+                self.schedule_refill()
+        if joke is None:
+            return None, "error"
+        if channel_id is not None:
+            joke_history.add(channel_id, joke["id"])
+        return joke, source
+
+    async def take_from_corpus(self, period=30):
+        # Loads jokes another worker saved since the last look into the pool; rereads at most every period seconds
+        if not self.corpus_path or time.monotonic() - self.corpus_loaded_at < period:
+            return
+        known = set(self.corpus)
+        await self.load_corpus()
+        for joke_id, joke in self.corpus.items():
+            if joke_id not in known:
+                self.jokes[joke_id] = joke
+        while len(self.jokes) > self.max_size:
+            self.jokes.popitem(last=False)
+
+    def from_corpus(self, channel_id):
+        unseen = [joke for joke_id, joke in self.corpus.items() if not joke_history.seen(channel_id, joke_id)]
+        return random.choice(unseen or list(self.corpus.values()) or [None])
+
+    def _read_corpus(self):
+        try:
+            with open(self.corpus_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _write_corpus(self, jokes):
+        import tempfile  # Only needed when saving the corpus
+        # A temp file of our own in the same directory, so processes sharing the corpus never clash
+        fd, temp_path = tempfile.mkstemp(prefix=".jokes-", suffix=".tmp", dir=os.path.dirname(os.path.abspath(self.corpus_path)))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(jokes, f)
+            os.replace(temp_path, self.corpus_path)  # Never leave a half-written corpus behind
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    async def load_corpus(self):
+        try:
+            jokes = await asyncio.to_thread(self._read_corpus)
+        except (OSError, ValueError) as e:
+            print(f"Error loading joke corpus: {e}")
+            return
+        self.corpus_loaded_at = time.monotonic()
+        for joke in jokes[-self.corpus_max:]:
+            self.corpus[joke["id"]] = joke
+        while len(self.corpus) > self.corpus_max:
+            self.corpus.popitem(last=False)
+
+    async def remember(self, jokes):
+        new = False
+        for joke in jokes:
+            new = new or joke["id"] not in self.corpus
+            self.corpus[joke["id"]] = joke
+            self.corpus.move_to_end(joke["id"])
+        while len(self.corpus) > self.corpus_max:
+            self.corpus.popitem(last=False)
+        if not new or not self.corpus_path:
+            return
+        async with self.corpus_lock:
+            try:
+                await asyncio.to_thread(self._write_corpus, list(self.corpus.values()))
+            except OSError as e:
+                print(f"Error saving joke corpus: {e}")
+
+    async def start(self):
+        if self.corpus_path:
+            await self.load_corpus()
+        self.schedule_refill()
+
+joke_pool = JokePool(
+    JOKE_POOL_SIZE, JOKE_POOL_LOW_WATERMARK, JOKE_BATCH_SIZE, JOKE_CORPUS_PATH, JOKE_CORPUS_MAX, JOKE_FETCH_TIMEOUT,
+    fetches=REFRESH_WORKER
+)
 
 # ===== UTILITY FUNCTIONS =====
 def parse_time(time_str):
@@ -107,76 +1475,613 @@ def format_time(seconds):
         return f"{seconds // 3600} hours {(seconds % 3600) // 60} min"
 
 # Modified get_meme function to handle Reddit initialization failure
-async def get_meme(subreddit_name="memes"):
+async def get_meme(subreddit_name="memes", channel_id=None):
+    started_at = time.perf_counter()
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"https://www.reddit.com/r/{subreddit_name}/hot.json?limit=50", headers={"User-Agent": "Auto Memer"}) as response:
-                data = await response.json()
-                posts = [post for post in data['data']['children'] if post['data']['url'].endswith(("jpg", "jpeg", "png", "gif"))]
+        post = prefetch_pool.pop(subreddit_name, channel_id)
+        if post is not None:
+            get_meme_latency.observe(time.perf_counter() - started_at, "prefetch")
+            return post['url'], post['title']
 
-                if not posts:
-                    return None, "No suitable memes found."
+        # Buffer empty or exhausted for this channel; fall back to the listing
+        posts = await get_hot_posts(subreddit_name)
+        get_meme_latency.observe(time.perf_counter() - started_at, "listing")
 
-                post = random.choice(posts)
-                return post['data']['url'], post['data']['title']
+        if not posts:
+            return None, "No suitable memes found."
+
+        post = pick_unseen_post(posts, channel_id)
+        return post['url'], post['title']
 
     except Exception as e:
+        get_meme_latency.observe(time.perf_counter() - started_at, "error")
         print(f"Error fetching meme: {e}")
         return None, None
 
-async def get_joke():
+async def get_joke(channel_id=None):
+    started_at = time.perf_counter()
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get("https://v2.jokeapi.dev/joke/Programming,Miscellaneous?type=twopart") as response:
-                if response.status == 200:
-                    joke_data = await response.json()
-                    if joke_data["type"] == "twopart":
-                        return joke_data["setup"], joke_data["delivery"]
-                    else:
-                        return joke_data["joke"], None  # For single-part jokes
-                else:
-                    print("Failed to fetch joke.")
-                    return None, None
+        joke, source = await joke_pool.get(channel_id)
+        get_joke_latency.observe(time.perf_counter() - started_at, source)
+        if joke is None:
+            return None, None
+        return joke["setup"], joke["delivery"]
     except Exception as e:
+        get_joke_latency.observe(time.perf_counter() - started_at, "error")
         print(f"Error fetching joke: {e}")
         return None, None
 
+async def search_gifs(keyword, offset=0, limit=GIF_PAGE_SIZE):
+    # Returns ([{"id", "url"}, ...], total results); only the fields /gif uses are kept
+    data = await fetch_json(
+        "giphy",
+        f"{GIPHY_BASE_URL}/v1/gifs/search",
+        params={"api_key": GIPHY_API_KEY, "q": keyword, "limit": limit, "offset": offset, "rating": "g", "lang": "en"}
+    )
+    gifs = [{"id": gif['id'], "url": gif['images']['original']['url']} for gif in data['data']]
+    return gifs, data.get('pagination', {}).get('total_count', offset + len(gifs))
+
+# ===== GIF SEARCH CACHE =====
+gif_pages = ListingCache(GIF_CACHE_TTL, 0, GIF_CACHE_MAX_PAGES)  # (keyword, offset) -> (gifs, total results)
+gif_flights = SingleFlight()
+gif_cursors = OrderedDict()  # (server, keyword) -> offset of the page the server is working through
+
+def normalize_gif_keyword(keyword):
+    return " ".join(keyword.lower().split())
+
+async def get_gif_page(keyword, offset):
+    page, _ = gif_pages.get((keyword, offset))
+    if page is not None:
+        gif_pages.hits += 1
+        return page
+    gif_pages.misses += 1
+
+    async def fetch():
+        page = await search_gifs(keyword, offset)
+        gif_pages.set((keyword, offset), page)
+        return page
+
+    return await gif_flights.do((keyword, offset), fetch)
+
+def set_gif_cursor(scope, keyword, offset):
+    gif_cursors[(scope, keyword)] = offset
+    gif_cursors.move_to_end((scope, keyword))
+    while len(gif_cursors) > GIF_CURSOR_MAX:
+        gif_cursors.popitem(last=False)
+
+async def get_gif(keyword, scope):
+    # Returns (url, total results); url is None when every GIF looked at was already sent to this scope.
+    # A server works through the results a page at a time and starts over after the last page.
+    keyword = normalize_gif_keyword(keyword)
+    offset = gif_cursors.get((scope, keyword), 0)
+    total = 0
+    for _ in range(GIF_PAGES_PER_REQUEST):
+        gifs, total = await get_gif_page(keyword, offset)
+        available_gifs = [gif for gif in gifs if not gif_history.seen(scope, gif['id'])]
+        if available_gifs:
+            selected_gif = random.choice(available_gifs)
+            gif_history.add(scope, selected_gif['id'])  # Remember it for this server
+            set_gif_cursor(scope, keyword, offset)
+            return selected_gif['url'], total
+        next_offset = offset + GIF_PAGE_SIZE
+        if not gifs or next_offset >= total:
+            next_offset = 0
+        set_gif_cursor(scope, keyword, next_offset)
+        if next_offset == offset:
+            break  # A single page of results, all sent
+        offset = next_offset
+    return None, total
+
+# ===== AUTO-POST SCHEDULER =====
+class AutoPostScheduler:
+    # A single task owns every auto-post schedule. Schedules live in a min-heap ordered by
+    # due time; cancel and reschedule leave the old heap entry behind and it is skipped
+    # when popped, so add/cancel/reschedule are all O(log n).
+    def __init__(self, handler, batch_size, coalesce_window=0, is_saturated=None, backoff=1.0):
+        self.handler = handler  # Coroutine function called with a list of due channel IDs
+        self.batch_size = batch_size
+        self.coalesce_window = coalesce_window  # Channels due this soon join the current batch
+        self.is_saturated = is_saturated  # While this returns True, due channels are held back
+        self.backoff = backoff
+        self.heap = []  # (due_time, seq, channel_id)
+        self.entries = {}  # channel_id -> (due_time, seq, interval) of the live schedule
+        self.seq = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.runner = None
+        self.dispatches = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, channel_id):
+        return channel_id in self.entries
+
+    def add(self, channel_id, interval, first_delay=None):
+        # Adding an already scheduled channel reschedules it
+        due_time = time.monotonic() + (interval if first_delay is None else first_delay)
+        seq = next(self.seq)
+        self.entries[channel_id] = (due_time, seq, interval)
+        heapq.heappush(self.heap, (due_time, seq, channel_id))
+        if self.heap[0][1] == seq:
+            self.wakeup.set()  # New earliest deadline, let the runner recompute its sleep
+        self._compact()
+
+    reschedule = add
+
+    def cancel(self, channel_id):
+        removed = self.entries.pop(channel_id, None) is not None
+        self._compact()
+        return removed
+
+    def _compact(self):
+        # Bound memory held by cancelled entries still sitting in the heap
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = [(due_time, seq, channel_id) for channel_id, (due_time, seq, _) in self.entries.items()]
+            heapq.heapify(self.heap)
+
+    def _is_live(self, heap_entry):
+        entry = self.entries.get(heap_entry[2])
+        return entry is not None and entry[1] == heap_entry[1]
+
+    def _pop_due(self, now):
+        batch = []
+        batched = set()
+        held = []  # Channels already in this batch whose next post is also inside the window
+        horizon = now + self.coalesce_window
+        while self.heap and self.heap[0][0] <= horizon and len(batch) < self.batch_size:
+            due_time, seq, channel_id = heapq.heappop(self.heap)
+            if not self._is_live((due_time, seq, channel_id)):
+                continue
+            if channel_id in batched:
+                held.append((due_time, seq, channel_id))
+                continue
+            interval = self.entries[channel_id][2]
+            next_due = due_time + interval
+            if next_due <= now:
+                next_due = now + interval  # Fell behind; don't fire a burst to catch up
+            next_due = max(next_due, horizon)  # Never due again within the window this batch covers
+            next_seq = next(self.seq)
+            self.entries[channel_id] = (next_due, next_seq, interval)
+            heapq.heappush(self.heap, (next_due, next_seq, channel_id))
+            batch.append(channel_id)
+            batched.add(channel_id)
+        for heap_entry in held:
+            heapq.heappush(self.heap, heap_entry)
+        return batch
+
+    async def _dispatch(self, batch):
+        try:
+            await self.handler(batch)
+        except Exception as e:
+            print(f"Error posting to scheduled channels: {e}")
+
+    async def run(self):
+        while True:
+            while self.heap and not self._is_live(self.heap[0]):
+                heapq.heappop(self.heap)
+
+            now = time.monotonic()
+            if self.heap and self.heap[0][0] <= now:
+                if self.is_saturated is not None and self.is_saturated():
+                    # Downstream can't keep up; leave channels due until it drains
+                    await asyncio.sleep(self.backoff)
+                    continue
+                batch = self._pop_due(now)
+                task = asyncio.create_task(self._dispatch(batch))
+                self.dispatches.add(task)
+                task.add_done_callback(self.dispatches.discard)
+                await asyncio.sleep(0)  # Let other work run between large batches
+                continue
+
+            self.wakeup.clear()
+            timeout = self.heap[0][0] - now if self.heap else None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self.runner is None:
+            self.runner = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.runner is not None:
+            self.runner.cancel()
+            self.runner = None
+        for task in list(self.dispatches):
+            task.cancel()
+
+# ===== CHANNEL REGISTRY =====
+class ChannelStore(ABC):
+    # Durable storage for auto-post schedules. Rows are dicts with channel_id, guild_id,
+    # search_query, interval and stopped. A backend missing any method fails when it is created.
+    @abstractmethod
+    async def load_all(self):
+        ...
+
+    @abstractmethod
+    async def save(self, row):
+        ...
+
+    @abstractmethod
+    async def delete(self, channel_id):
+        ...
+
+    # Small JSON-serializable settings, keyed by strings like "keywords:<guild_id>"
+    @abstractmethod
+    async def load_settings(self, prefix):
+        ...
+
+    @abstractmethod
+    async def save_setting(self, key, value):
+        ...
+
+    @abstractmethod
+    async def delete_setting(self, key):
+        ...
+
+    async def close(self):
+        pass
+
+class MemoryChannelStore(ChannelStore):
+    def __init__(self, path=None):
+        self.rows = {}
+        self.settings = {}
+
+    async def load_all(self):
+        return [dict(row) for row in self.rows.values()]
+
+    async def save(self, row):
+        self.rows[row["channel_id"]] = dict(row)
+
+    async def delete(self, channel_id):
+        self.rows.pop(channel_id, None)
+
+    async def load_settings(self, prefix):
+        return {key: value for key, value in self.settings.items() if key.startswith(prefix)}
+
+    async def save_setting(self, key, value):
+        self.settings[key] = value
+
+    async def delete_setting(self, key):
+        self.settings.pop(key, None)
+
+class SQLiteChannelStore(ChannelStore):
+    # sqlite3 calls run in a worker thread so disk I/O never blocks the event loop
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.lock = asyncio.Lock()
+
+    def _connect(self):
+        if self.conn is None:
+            import sqlite3  # Only the sqlite backend needs it
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS channels ("
+                "channel_id INTEGER PRIMARY KEY, guild_id INTEGER, search_query TEXT NOT NULL, "
+                "interval INTEGER NOT NULL, stopped INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.conn.commit()
+        return self.conn
+
+    async def _run(self, fn, *args):
+        async with self.lock:
+            return await asyncio.to_thread(fn, *args)
+
+    def _load_all(self):
+        cursor = self._connect().execute("SELECT channel_id, guild_id, search_query, interval, stopped FROM channels")
+        return [
+            {"channel_id": channel_id, "guild_id": guild_id, "search_query": search_query, "interval": interval, "stopped": bool(stopped)}
+            for channel_id, guild_id, search_query, interval, stopped in cursor.fetchall()
+        ]
+
+    def _save(self, row):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO channels (channel_id, guild_id, search_query, interval, stopped, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (row["channel_id"], row["guild_id"], row["search_query"], row["interval"], int(row["stopped"]), time.time())
+        )
+        conn.commit()
+
+    def _delete(self, channel_id):
+        conn = self._connect()
+        conn.execute("DELETE FROM channels WHERE channel_id = ?", (channel_id,))
+        conn.commit()
+
+    def _load_settings(self, prefix):
+        cursor = self._connect().execute(
+            "SELECT key, value FROM settings WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+        return {key: json.loads(value) for key, value in cursor.fetchall()}
+
+    def _save_setting(self, key, value):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+        conn.commit()
+
+    def _delete_setting(self, key):
+        conn = self._connect()
+        conn.execute("DELETE FROM settings WHERE key = ?", (key,))
+        conn.commit()
+
+    async def load_all(self):
+        return await self._run(self._load_all)
+
+    async def load_settings(self, prefix):
+        return await self._run(self._load_settings, prefix)
+
+    async def save_setting(self, key, value):
+        await self._run(self._save_setting, key, value)
+
+    async def delete_setting(self, key):
+        await self._run(self._delete_setting, key)
+
+    async def save(self, row):
+        await self._run(self._save, row)
+
+    async def delete(self, channel_id):
+        await self._run(self._delete, channel_id)
+
+    async def close(self):
+        if self.conn is not None:
+            await self._run(self.conn.close)
+            self.conn = None
+
+CHANNEL_STORES = {
+    "sqlite": SQLiteChannelStore,
+    "memory": MemoryChannelStore,
+}
+
+channel_store = CHANNEL_STORES[CHANNEL_STORE_BACKEND](CHANNEL_STORE_PATH)
+channels_resumed = False
+
+async def save_channel_config(channel_id):
+    config = active_channels.get(channel_id)
+    if config is None:
+        return
+    try:
+        await channel_store.save({
+            "channel_id": channel_id,
+            "guild_id": config.get("guild_id"),
+            "search_query": config["search_query"],
+            "interval": config["interval"],
+            "stopped": channel_id in stopped_channels
+        })
+    except Exception as e:
+        print(f"Error saving channel {channel_id}: {e}")
+
+async def load_channel_registry():
+    # Bulk-load saved schedules; they start posting once the bot is ready
+    try:
+        rows = await channel_store.load_all()
+    except Exception as e:
+        print(f"Error loading saved channels: {e}")
+        return
+    rows = [row for row in rows if owns_guild(row["guild_id"])]  # Other workers post to the rest
+    for row in rows:
+        active_channels[row["channel_id"]] = {
+            "channel": None,  # Resolved from the cache when the channel first posts
+            "guild_id": row["guild_id"],
+            "search_query": row["search_query"],
+            "interval": row["interval"]
+        }
+        if row["stopped"]:
+            stopped_channels.add(row["channel_id"])
+    print(f"\nLoaded {len(rows):,} saved meme channel(s)")
+
+def resume_auto_posting():
+    # Spread first posts over RESUME_JITTER so restored channels don't all fetch at once
+    global channels_resumed
+    if channels_resumed:
+        return
+    channels_resumed = True
+    for channel_id, config in active_channels.items():
+        if channel_id in stopped_channels or channel_id in auto_post_scheduler:
+            continue
+        interval = max(config["interval"], AUTOPOST_MIN_INTERVAL)  # Older saves may predate the minimum
+        first_delay = random.uniform(0, min(interval, RESUME_JITTER))
+        auto_post_scheduler.add(channel_id, interval, first_delay=first_delay)
+
+# ===== KEYWORD TRIGGERS =====
+class KeywordMatcher:
+    # Messages shorter than the shortest phrase are rejected without lowercasing. A few
+    # phrases are checked with plain substring search, which beats the regex engine; larger
+    # sets are compiled into one alternation so the text is scanned once.
+    __slots__ = ("keywords", "pattern", "min_length")
+
+    def __init__(self, keywords):
+        self.keywords = sorted({keyword.strip().lower() for keyword in keywords if keyword.strip()})
+        self.min_length = min((len(keyword) for keyword in self.keywords), default=0)
+        self.pattern = None
+        if len(self.keywords) > 4:
+            self.pattern = re.compile("|".join(re.escape(keyword) for keyword in sorted(self.keywords, key=len, reverse=True)))
+
+    def matches(self, text):
+        if not self.keywords or len(text) < self.min_length:
+            return False
+        text = text.lower()
+        if self.pattern is not None:
+            return self.pattern.search(text) is not None
+        for keyword in self.keywords:
+            if keyword in text:
+                return True
+        return False
+
+class Cooldowns:
+    # Keys are blocked for `period` seconds after they fire. Entries are kept in firing
+    # order, so expired ones are always at the front and are pruned as new ones arrive.
+    def __init__(self, period, max_keys=100000):
+        self.period = period
+        self.max_keys = max_keys
+        self.expires = OrderedDict()
+
+    def ready(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        expires_at = self.expires.get(key)
+        return expires_at is None or expires_at <= now
+
+    def trigger(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        self.expires.pop(key, None)
+        self.expires[key] = now + self.period
+        while self.expires:
+            oldest_key, oldest_expiry = next(iter(self.expires.items()))
+            if oldest_expiry > now and len(self.expires) <= self.max_keys:
+                break
+            del self.expires[oldest_key]
+
+default_matcher = KeywordMatcher(TRIGGER_KEYWORDS)
+guild_matchers = {}  # guild_id -> KeywordMatcher for servers with custom phrases
+channel_trigger_cooldowns = Cooldowns(TRIGGER_CHANNEL_COOLDOWN)
+user_trigger_cooldowns = Cooldowns(TRIGGER_USER_COOLDOWN)
+
+def get_trigger_matcher(guild_id):
+    return guild_matchers.get(guild_id, default_matcher)
+
+async def load_trigger_keywords():
+    try:
+        saved = await channel_store.load_settings("keywords:")
+    except Exception as e:
+        print(f"Error loading trigger keywords: {e}")
+        return
+    for key, keywords in saved.items():
+        guild_matchers[int(key.split(":", 1)[1])] = KeywordMatcher(keywords)
+
+def should_trigger(message):
+    # Cheap checks first: nearly every message exits at the matcher
+    if message.author.bot or not message.content:
+        return False
+    if not get_trigger_matcher(message.guild.id if message.guild else None).matches(message.content):
+        return False
+    now = time.monotonic()
+    if not user_trigger_cooldowns.ready(message.author.id, now) or not channel_trigger_cooldowns.ready(message.channel.id, now):
+        return False
+    user_trigger_cooldowns.trigger(message.author.id, now)
+    channel_trigger_cooldowns.trigger(message.channel.id, now)
+    return True
+
 # ===== CORE FUNCTIONALITY =====
-async def post_meme_to_channel(channel, interval, subreddit_name):
+async def post_meme_to_channel(channel, meme_url, meme_title):
     global memes_posted
-    while True:
-        if channel.id in stopped_channels:
-            break
-        meme_url, meme_title = await get_meme(subreddit_name)  # Remove await here
-        if meme_url:
-            await channel.send(f"**{meme_title}**\n{meme_url}")
-            memes_posted += 1
-        
-        await asyncio.sleep(interval)
+    message = await send_queue.send(
+        channel,
+        f"**{meme_title}**\n{meme_url}",
+        priority=PRIORITY_AUTOPOST,
+        stale_after=SEND_STALE_AFTER
+    )
+    if message is not None:
+        memes_posted += 1
+
+async def post_subreddit_group(subreddit_name, channels):
+    # One listing fetch feeds every channel in the group, each getting a different post
+    try:
+        posts = await get_hot_posts(subreddit_name, PRIORITY_AUTOPOST)
+    except Exception as e:
+        print(f"Error fetching meme: {e}")
+        return
+    if not posts:
+        return
+
+    jobs = []
+    picked = set()
+    for channel in channels:
+        post = pick_unseen_post(posts, channel.id, exclude=picked)
+        picked.add(post['id'])
+        if len(picked) >= len(posts):
+            picked.clear()  # More channels than posts; start handing out posts again
+        jobs.append(post_meme_to_channel(channel, post['url'], post['title']))
+    results = await asyncio.gather(*jobs, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Error auto-posting meme: {result}")
+
+async def post_due_channels(channel_ids):
+    groups = {}
+    for channel_id in channel_ids:
+        config = active_channels.get(channel_id)
+        if config is None:
+            auto_post_scheduler.cancel(channel_id)
+            continue
+        channel = config["channel"] or bot.get_channel(channel_id)
+        if channel is None:
+            continue  # Not in the cache (yet); try again on the next tick
+        config["channel"] = channel
+        groups.setdefault(config["search_query"].lower(), []).append(channel)
+
+    await asyncio.gather(*(post_subreddit_group(name, channels) for name, channels in groups.items()))
+
+def reddit_requests_per_meme():
+    # Auto-post listing fetches per auto-posted meme; other Reddit traffic (prefetch, top
+    # listings, interactive commands) is left out
+    if not memes_posted:
+        return 0.0
+    return autopost_listing_fetches / memes_posted
+
+auto_post_scheduler = AutoPostScheduler(
+    post_due_channels,
+    AUTOPOST_BATCH_SIZE,
+    AUTOPOST_COALESCE_WINDOW,
+    is_saturated=send_queue.saturated
+)
 
 def get_server_count():
-    return len(bot.guilds)  # Count the number of servers the bot has joined
+    return cluster_client.total("guilds", len(bot.guilds))  # Servers joined, across every worker in a cluster
+
+# ===== COMMAND SYNC =====
+COMMAND_HASH_KEY = "command_tree_hash"
+
+def command_tree_hash():
+    # The same payload tree.sync() uploads, so any change Discord would see changes the hash
+    payload = sorted(
+        (command.to_dict(bot.tree) for command in bot.tree.get_commands()),
+        key=lambda command: (command.get("type", 1), command["name"])
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+async def sync_commands(force=False):
+    # Returns the synced commands, or None when the tree is unchanged since the last sync
+    global synced_command_hash
+    digest = command_tree_hash()
+    if not force:
+        if synced_command_hash is None:
+            try:
+                synced_command_hash = (await channel_store.load_settings(COMMAND_HASH_KEY)).get(COMMAND_HASH_KEY)
+            except Exception as e:
+                print(f"Error loading command tree hash: {e}")
+        if synced_command_hash == digest:
+            return None
+
+    synced = await bot.tree.sync(guild=None)  # Sync globally
+    synced_command_hash = digest
+    try:
+        await channel_store.save_setting(COMMAND_HASH_KEY, digest)
+    except Exception as e:
+        print(f"Error saving command tree hash: {e}")
+    return synced
 
 # ===== EVENT HANDLERS =====
 @bot.event
 async def on_ready():
     print(f"\nBot is ready as {bot.user.name}")
-    server_count = len(bot.guilds)
+    server_count = get_server_count()
     print(f"\nThe bot is in {server_count:,} servers.")
 
-    # Sync commands on startup
+    resume_auto_posting()
+
+    # Sync commands on startup, but only when they changed since the last sync
     try:
-        global last_sync_time
-        current_time = datetime.now()
-        
-        # Sync commands only if the cooldown period has passed
-        if not last_sync_time or (current_time - last_sync_time).total_seconds() > SYNC_COOLDOWN:
-            start_time = time.time()
-            synced = await bot.tree.sync(guild=None)  # Sync globally
-            last_sync_time = current_time
-            print(f"\nSynced {len(synced)} command(s) in {time.time() - start_time:.2f} seconds")
+        if CLUSTER_WORKER_ID > 0:
+            print("\nSkipping command sync; worker 0 syncs for the cluster")
         else:
-            print("\nSkipping command sync due to cooldown")
+            start_time = time.time()
+            synced = await sync_commands()
+            if synced is None:
+                print("\nSkipping command sync; commands are unchanged")
+            else:
+                print(f"\nSynced {len(synced)} command(s) in {time.time() - start_time:.2f} seconds")
     except Exception as e:
         print(f"\nError syncing commands: {e}")
     
@@ -191,122 +2096,312 @@ async def on_ready():
 
 @bot.event
 async def on_message(message):
-    if message.author.bot:
-        return
-
     # Keyword-based trigger
-    keywords = ["post a meme", "send meme"]
-    if any(keyword in message.content.lower() for keyword in keywords):
-        meme_url, meme_title = await get_meme("funny")  # Remove await here
+    if should_trigger(message):
+        meme_url, meme_title = await get_meme("funny", message.channel.id)
         if meme_url:
-            await message.channel.send(f"**{meme_title}**\n{meme_url}")
+            await send_queue.send(message.channel, f"**{meme_title}**\n{meme_url}")
         else:
-            await message.channel.send("Sorry, couldn't fetch a meme right now.")
+            await send_queue.send(message.channel, "Sorry, couldn't fetch a meme right now.")
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    record_command_latency(interaction, "ok")
+
+@bot.event
+async def on_guild_join(guild):
+    response_templates.invalidate("help")  # Shows the server count
+
+@bot.event
+async def on_guild_remove(guild):
+    response_templates.invalidate("help")
 
 @bot.event
 async def on_interaction(interaction: discord.Interaction):
     if interaction.type == discord.InteractionType.application_command:
         command_history_list.append(
-            f"/{interaction.data['name']}"
+            (time.time(), f"/{interaction.data['name']}")
         )  # Add command to history
 
-# ===== SLASH COMMANDS =====
-@bot.tree.command(name="help", description="Show a list of all available commands.")
-async def help_command(interaction: discord.Interaction):
-    def generate_help_embed():
-        server_count = len(bot.guilds)  # Count the number of servers the bot has joined
-        embed = Embed(title="Help - Available Commands", description=f"- Bot is currently in {server_count} servers", color=discord.Color.blue())
-        
-        # Meme Commands
-        embed.add_field(
-            name="🎭 Meme Commands",
-            value=(
-                "</meme:1331251925491908791> - Fetch and post a meme with refresh option\n"
-                "</meme_search:1333204607261872189> - Search for memes with specific keywords\n"
-                "</top_memes:1333204607261872190> - Get top memes from a time period\n"
-                "</setchannel:1325134226810736711> - Set a channel for auto-posting memes\n"
-
-                "</stopmemes:1325622113557549127> - Stop posting memes in a channel\n"
-                "</startmemes:1328806127496073250> - Resume posting memes in a channel\n"
-                "</memes_by_number:1329566549736034336> - Fetch multiple memes at once"
+# ===== RESPONSE TEMPLATES =====
+class TemplateCache:
+    # Embeds and views that are built once and sent many times. Each entry remembers the
+    # inputs it was built from and is rebuilt only when they differ on the next request.
+    def __init__(self):
+        self.entries = {}  # name -> (inputs, template)
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, name, build, *inputs):
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] == inputs:
+            self.hits += 1
+            return entry[1]
+        template = build(*inputs)
+        self.entries[name] = (inputs, template)
+        self.builds += 1
+        return template
+
+    def invalidate(self, *names):
+        for name in names:
+            self.entries.pop(name, None)
+
+response_templates = TemplateCache()
+
+def static_view(*items):
+    # A finished view is sent as plain components: it never joins the view store or starts a
+    # timeout, so one instance can go out with every message. Clicks on its buttons are
+    # handled by the persistent views registered in register_persistent_views.
+    view = View()
+    for item in items:
+        view.add_item(item)
+    view.stop()
+    return view
 
-            ),
-            inline=False
-        )
-        
-        # Fun Commands
-        embed.add_field(
-            name="🎮 Fun Commands",
-            value=(
-                "</random_joke:1333204607261872192> - Fetch and post a random joke\n"
-                "</ping:1333204607261872193> - Check bot's latency\n"
-                "</gif:1334852877360828456> - Search and display a random GIF based on a keyword"
-            ),
-            inline=False
-        )
-        
-        # Info Commands
-        embed.add_field(
-            name="ℹ️ Information Commands",
-            value=(
-                "</serverinfo:1333204607261872194> - Display server information\n"
-                "</userinfo:1333204607261872195> - Show information about a user\n"
-                "</stats:1326171297440600074> - Show bot statistics\n"
-                "</command_history:1331251925491908793> - View command usage history\n"
-                "</server_counter:1326171297440600076> - Show how many servers the bot has joined"
-            ),
-            inline=False
-        )
+def persistent_view(*items):
+    view = View(timeout=None)
+    for item in items:
+        view.add_item(item)
+    return view
 
-        # Utility Commands
-        embed.add_field(
-            name="🛠️ Utility Commands",
-            value=(
-                "</invite:1333204607261872191> - Get bot invite link\n"
-                "</report:1333204607261872196> - Report an issue with the bot"
-            ),
-            inline=False
-        )
+async def close_help_message(interaction: discord.Interaction):
+    await interaction.message.delete()
 
-        embed.set_footer(text="[Optional] parameters, <Required> parameters")
-        return embed
+async def refresh_stats_message(interaction: discord.Interaction):
+    await interaction.response.edit_message(embed=stats_embed(), view=response_templates.get("stats_view", build_stats_view))
 
-    help_embed = generate_help_embed()
-    
-    # Create buttons
-    close_button = Button(label="Close", style=discord.ButtonStyle.danger)
+def help_buttons():
     invite_button = Button(
         label="Join Support Server",
         style=discord.ButtonStyle.link,
         url="https://discord.gg/QegFaGhmmq"
     )
+    close_button = Button(label="Close", style=discord.ButtonStyle.danger, custom_id="help:close")
+    close_button.callback = close_help_message
+    return invite_button, close_button
+
+def stats_buttons():
+    refresh_button = Button(label="Refresh Stats", style=discord.ButtonStyle.primary, custom_id="stats:refresh")
+    refresh_button.callback = refresh_stats_message
+    return (refresh_button,)
+
+def register_persistent_views():
+    # One listening view per button set answers clicks on every message that carries it, including
+    # messages sent before a restart
+    bot.add_view(persistent_view(*help_buttons()))
+    bot.add_view(persistent_view(*stats_buttons()))
+
+def build_help_embed(server_count):
+    embed = Embed(title="Help - Available Commands", description=f"- Bot is currently in {server_count} servers", color=discord.Color.blue())
+    
+    # Meme Commands
+    embed.add_field(
+        name="🎭 Meme Commands",
+        value=(
+            "</meme:1331251925491908791> - Fetch and post a meme with refresh option\n"
+            "</meme_search:1333204607261872189> - Search for memes with specific keywords\n"
+            "</top_memes:1333204607261872190> - Get top memes from a time period\n"
+            "</setchannel:1325134226810736711> - Set a channel for auto-posting memes\n"
 
-    async def close_callback(interaction: discord.Interaction):
-        await interaction.message.delete()
+            "</stopmemes:1325622113557549127> - Stop posting memes in a channel\n"
+            "</startmemes:1328806127496073250> - Resume posting memes in a channel\n"
+            "</memes_by_number:1329566549736034336> - Fetch multiple memes at once"
 
-    close_button.callback = close_callback
+        ),
+        inline=False
+    )
+    
+    # Fun Commands
+    embed.add_field(
+        name="🎮 Fun Commands",
+        value=(
+            "</random_joke:1333204607261872192> - Fetch and post a random joke\n"
+            "</ping:1333204607261872193> - Check bot's latency\n"
+            "</gif:1334852877360828456> - Search and display a random GIF based on a keyword"
+        ),
+        inline=False
+    )
+    
+    # Info Commands
+    embed.add_field(
+        name="ℹ️ Information Commands",
+        value=(
+            "</serverinfo:1333204607261872194> - Display server information\n"
+            "</userinfo:1333204607261872195> - Show information about a user\n"
+            "</stats:1326171297440600074> - Show bot statistics\n"
+            "</command_history:1331251925491908793> - View command usage history\n"
+            "</server_counter:1326171297440600076> - Show how many servers the bot has joined"
+        ),
+        inline=False
+    )
 
-    view = View()
-    view.add_item(invite_button)
-    view.add_item(close_button)
+    # Utility Commands
+    embed.add_field(
+        name="🛠️ Utility Commands",
+        value=(
+            "</invite:1333204607261872191> - Get bot invite link\n"
+            "</report:1333204607261872196> - Report an issue with the bot\n"
+            "`/trigger_keywords` - Set the phrases that make the bot post a meme"
+        ),
+        inline=False
+    )
 
-    # Acknowledge the interaction and send the help embed
-    await interaction.response.send_message(embed=help_embed, view=view)
+    embed.set_footer(text="[Optional] parameters, <Required> parameters")
+    return embed
 
-@bot.tree.command(name="vote", description="Vote for the bot on top.gg.")
-async def vote(interaction: discord.Interaction):
-    embed = Embed(
+def build_vote_embed():
+    return Embed(
         title="Vote for Me on top.gg!",
         description="If you enjoy using this bot, please take a moment to vote for it on top.gg. Your support helps improve the bot and keep it active!\n\nClick the button below to vote.",
         color=discord.Color.green(),
     )
-    vote_button = Button(
+
+def build_vote_view():
+    return static_view(Button(
         label="Vote for Me",
         style=discord.ButtonStyle.link,
         url="https://top.gg/bot/1325110227225546854/vote",
+    ))
+
+def build_invite_embed():
+    embed = discord.Embed(
+        title="🤖 Invite Me to Your Server!",
+        description="Click the button below to add me to your server and start enjoying memes and jokes!",
+        color=discord.Color.blue()
     )
-    view = View()
-    view.add_item(vote_button)
+    embed.add_field(
+        name="Features",
+        value="• Auto-posting memes\n• Random jokes\n• Easy to use commands\n• And much more!",
+        inline=False
+    )
+    return embed
+
+def build_invite_view(bot_id):
+    bot_invite_link = f"https://discord.com/oauth2/authorize?client_id={bot_id}&permissions=8&scope=bot%20applications.commands"
+    invite_button = Button(
+        label="Add to Server", 
+        style=discord.ButtonStyle.link,
+        url=bot_invite_link,
+        emoji="➕"
+    )
+    support_button = Button(
+        label="Support Server",
+        style=discord.ButtonStyle.link,
+        url="https://discord.gg/TpD8qT5z54",
+        emoji="❓"
+    )
+    return static_view(invite_button, support_button)
+
+def stats_fields():
+    # (name, value, inline) for every /stats field
+    fields = [
+        ("Memes Posted", str(cluster_client.total("memes_posted", memes_posted)), True),
+        ("Meme Commands Used", str(cluster_client.total("meme_command_count", meme_command_count)), True),
+        ("Active Channels", str(cluster_client.total("active_channels", len(active_channels))), True),
+        ("Stopped Channels", str(cluster_client.total("stopped_channels", len(stopped_channels))), True),
+    ]
+    if cluster_client.enabled:
+        fields.append((
+            "Cluster",
+            f"{len(cluster_client.peers) + 1} workers reporting | this is worker {CLUSTER_WORKER_ID} "
+            f"(shards {SHARD_IDS[0]}-{SHARD_IDS[-1]} of {SHARD_COUNT}) | cache and queue figures below are this worker's",
+            False
+        ))
+    fields += [
+        ("Listing Cache", f"{listing_cache.hits} hits | {listing_cache.stale_hits} stale | {listing_cache.misses} misses", True),
+        ("Coalesced Fetches", str(listing_flights.coalesced), True),
+        ("Reddit Requests per Meme", f"{reddit_requests_per_meme():.2f}", True),
+        (
+            "Upstream Queues",
+            "\n".join(
+                f"{limiter.name}: {limiter.queue_depth()} queued | {limiter.average_wait() * 1000:.0f} ms avg wait | {limiter.max_wait * 1000:.0f} ms max"
+                for limiter in upstream_limiters.values()
+            ),
+            False
+        ),
+        (
+            "Send Queue",
+            f"{send_queue.size} queued | {send_queue.sent:,} sent | {send_queue.failed} failed | "
+            f"{send_queue.dropped_stale} stale | {send_queue.rejected} refused",
+            False
+        ),
+        ("Prefetch Buffers", f"{prefetch_pool.hits} hits | {prefetch_pool.misses} misses | {len(prefetch_pool.buffers)} subreddits", True),
+        (
+            "Top Listings",
+            f"{top_listings.hits} hits | {top_listings.misses} misses | {top_listings.refreshes} refreshes | {top_listings.failures} failed",
+            True
+        ),
+        ("GIF Cache", f"{gif_pages.hits} hits | {gif_pages.misses} misses | {len(gif_pages.entries)} pages", True),
+        ("Joke Pool", f"{len(joke_pool.jokes)} ready | {joke_pool.hits} hits | {joke_pool.misses} misses | {joke_pool.fallbacks} from corpus", True),
+        (
+            "Repeat Filter",
+            f"{post_history.entry_count():,} memes in {len(post_history.scopes):,} channels | "
+            f"{gif_history.entry_count():,} GIFs in {len(gif_history.scopes):,} servers | "
+            f"{(post_history.memory_bytes() + gif_history.memory_bytes()) / 1024:,.0f} KiB",
+            False
+        ),
+    ]
+    if active_channels:
+        sample_channel = next(iter(active_channels.values()))
+        fields.append(("Sample Interval", format_time(sample_channel["interval"]), False))
+    return tuple(fields)
+
+def build_stats_embed(fields, avatar_url):
+    embed = Embed(title="Bot Statistics", color=discord.Color.green())
+    for name, value, inline in fields:
+        embed.add_field(name=name, value=value, inline=inline)
+    embed.set_thumbnail(url=avatar_url)
+    return embed
+
+def build_stats_view():
+    return static_view(*stats_buttons())
+
+def stats_embed():
+    # Built fresh each time; the live counters change between almost every request
+    avatar_url = bot.user.avatar.url if bot.user.avatar else bot.user.default_avatar.url
+    return build_stats_embed(stats_fields(), avatar_url)
+
+def build_top_embeds(posts, timeframe):
+    embeds = []
+    for post in posts[:10]:
+        embed = discord.Embed(
+            title=post["title"],
+            color=discord.Color.random()
+        )
+        embed.set_image(url=post["url"])
+        embed.add_field(name="Score", value=f"👍 {post['score']:,}", inline=True)
+        embed.add_field(name="Comments", value=f"💬 {post['num_comments']:,}", inline=True)
+        embed.set_footer(text=f"Top meme from the last {timeframe}")
+        embeds.append(embed)
+    return embeds
+
+def top_embeds(subreddit_name, timeframe, posts):
+    # Rebuilt only when the refresher replaces the listing
+    return response_templates.get(f"top:{subreddit_name.lower()}:{timeframe}", build_top_embeds, posts, timeframe)
+
+def prepare_response_templates():
+    # Views need a running event loop, so this runs from setup_hook rather than at import.
+    # The invite view needs the bot's user ID, which isn't known before login; /invite builds it.
+    register_persistent_views()
+    response_templates.get("help_view", lambda: static_view(*help_buttons()))
+    response_templates.get("stats_view", build_stats_view)
+    response_templates.get("vote", build_vote_embed)
+    response_templates.get("vote_view", build_vote_view)
+    response_templates.get("invite", build_invite_embed)
+
+# ===== SLASH COMMANDS =====
+@bot.tree.command(name="help", description="Show a list of all available commands.")
+async def help_command(interaction: discord.Interaction):
+    help_embed = response_templates.get("help", build_help_embed, get_server_count())
+    view = response_templates.get("help_view", lambda: static_view(*help_buttons()))
+
+    # Acknowledge the interaction and send the help embed
+    await interaction.response.send_message(embed=help_embed, view=view)
+
+@bot.tree.command(name="vote", description="Vote for the bot on top.gg.")
+async def vote(interaction: discord.Interaction):
+    embed = response_templates.get("vote", build_vote_embed)
+    view = response_templates.get("vote_view", build_vote_view)
 
     await interaction.response.send_message(embed=embed, view=view)
 
@@ -320,7 +2415,7 @@ async def meme(
     await interaction.response.defer()  # Defer response if meme takes time to fetch
     
     try:
-        meme_url, meme_title = await get_meme(subreddit)  # Remove await here
+        meme_url, meme_title = await get_meme(subreddit, interaction.channel_id)
         if meme_url:
             embed = discord.Embed(
                 title=meme_title,
@@ -336,7 +2431,7 @@ async def meme(
             async def refresh_callback(button_interaction: discord.Interaction):
                 global meme_command_count  # Access the global counter
                 meme_command_count += 1  # Increment the counter for the new meme
-                new_meme_url, new_meme_title = await get_meme(subreddit)  # Remove await here
+                new_meme_url, new_meme_title = await get_meme(subreddit, button_interaction.channel_id)
                 if new_meme_url:
                     new_embed = discord.Embed(
                         title=new_meme_title,
@@ -375,21 +2470,31 @@ async def meme_search(interaction: discord.Interaction, keyword: str):
             await interaction.followup.send("Please provide a valid keyword for the search.", ephemeral=True)
             return
         
-        # Search in multiple meme subreddits
-        subreddits = ["memes", "dankmemes", "funny"]
+        # Search all meme subreddits at once and keep whatever arrives before the deadline
+        searches = {
+            asyncio.create_task(fetch_listing(subreddit_name, "search", q=keyword, restrict_sr=1, limit=5)): subreddit_name
+            for subreddit_name in MEME_SEARCH_SUBREDDITS
+        }
+        done, pending = await asyncio.wait(searches, timeout=MEME_SEARCH_DEADLINE)
+        for task in pending:
+            task.cancel()
+        timed_out = sorted(searches[task] for task in pending)
+        timeout_note = f" | Timed out: {', '.join(f'r/{name}' for name in timed_out)}" if timed_out else ""
         found_memes = []
         
-        for subreddit_name in subreddits:
-            subreddit = reddit.subreddit(subreddit_name)
-            search_results = subreddit.search(keyword, limit=5)  # Use the keyword for searching
+        for task in done:
+            subreddit_name = searches[task]
+            if task.exception():
+                print(f"Error searching r/{subreddit_name}: {task.exception()}")
+                continue
             
-            for post in search_results:
-                if post.url.endswith(("jpg", "jpeg", "png", "gif")):
+            for post in task.result():
+                if post["url"].endswith(("jpg", "jpeg", "png", "gif")):
                     found_memes.append({
-                        "title": post.title,
-                        "url": post.url,
+                        "title": post["title"],
+                        "url": post["url"],
                         "subreddit": subreddit_name,
-                        "score": post.score
+                        "score": post["score"]
                     })
         
         if found_memes:
@@ -406,7 +2511,7 @@ async def meme_search(interaction: discord.Interaction, keyword: str):
             embed.set_footer(
                 text=f"Meme {current_index + 1}/{len(found_memes)} | "
                 f"From r/{found_memes[current_index]['subreddit']} | "
-                f"Score: {found_memes[current_index]['score']}"
+                f"Score: {found_memes[current_index]['score']}{timeout_note}"
             )
             
             # Create navigation buttons
@@ -443,7 +2548,7 @@ async def meme_search(interaction: discord.Interaction, keyword: str):
                 new_embed.set_footer(
                     text=f"Meme {current_index + 1}/{len(found_memes)} | "
                     f"From r/{found_memes[current_index]['subreddit']} | "
-                    f"Score: {found_memes[current_index]['score']}"
+                    f"Score: {found_memes[current_index]['score']}{timeout_note}"
                 )
                 
                 # Update button states
@@ -468,7 +2573,7 @@ async def meme_search(interaction: discord.Interaction, keyword: str):
                 view=view
             )
         else:
-            await interaction.followup.send(f"No memes found matching '{keyword}'.")
+            await interaction.followup.send(f"No memes found matching '{keyword}'.{timeout_note}")
             
     except Exception as e:
         # If the interaction hasn't been acknowledged yet, acknowledge it with an error message
@@ -485,10 +2590,12 @@ async def meme_search(interaction: discord.Interaction, keyword: str):
             )
 
 @bot.tree.command(name="top_memes", description="Get top memes from the last day/week/month/year.")
+@app_commands.choices(subreddit=[app_commands.Choice(name=f"r/{name}", value=name) for name in top_listings.subreddits])
 async def top_memes(
     interaction: discord.Interaction,
     timeframe: str = "day",  # day, week, month, year
-    count: int = 5  # How many memes to fetch
+    count: int = 5,  # How many memes to fetch
+    subreddit: str = TOP_SUBREDDITS[0] if TOP_SUBREDDITS else "memes"
 ):
     valid_timeframes = ["day", "week", "month", "year"]
     if timeframe not in valid_timeframes:
@@ -508,21 +2615,9 @@ async def top_memes(
     await interaction.response.defer()
     
     try:
-        subreddit = reddit.subreddit("memes")
-        top_posts = subreddit.top(time_filter=timeframe, limit=count)
-        
-        embeds = []
-        for post in top_posts:
-            if post.url.endswith(("jpg", "jpeg", "png", "gif")):
-                embed = discord.Embed(
-                    title=post.title,
-                    color=discord.Color.random()
-                )
-                embed.set_image(url=post.url)
-                embed.add_field(name="Score", value=f"👍 {post.score:,}", inline=True)
-                embed.add_field(name="Comments", value=f"💬 {post.num_comments:,}", inline=True)
-                embed.set_footer(text=f"Top meme from the last {timeframe}")
-                embeds.append(embed)
+        # Served from the background-refreshed listing; Reddit is only asked before the first refresh lands
+        top_posts = await top_listings.get(subreddit, timeframe)
+        embeds = top_embeds(subreddit, timeframe, top_posts)[:count]
         
         if embeds:
             await interaction.followup.send(
@@ -543,60 +2638,37 @@ async def memes_by_number(interaction: discord.Interaction, count: int):
         )
         return
 
+    await interaction.response.defer()  # The listing fetch may outlast Discord's 3-second window
+
+    def build_embed(post):
+        embed = discord.Embed(
+            title=post["title"],
+            url=f"https://www.reddit.com{post['permalink']}",
+            description=f"Subreddit: {post['subreddit']}",
+            color=discord.Color.green(),
+        )
+        embed.set_image(url=post["url"])
+        embed.set_footer(text=f"👍 {post['ups']} | Author: {post.get('author') or 'Unknown'}")
+        return embed
+
     try:
-        # Access the 'memes' subreddit
-        subreddit = reddit.subreddit("memes")
-
-        # Fetch 'count' number of posts from the subreddit
-        posts = subreddit.new(limit=count)
-
-        # Prepare a list of memes with necessary information
-        memes = []
-        for post in posts:
-            memes.append(
-                {
-                    "title": post.title,
-                    "url": post.url,
-                    "ups": post.ups,
-                    "author": post.author.name if post.author else "Unknown",
-                    "postLink": f"https://www.reddit.com{post.permalink}",
-                    "subreddit": post.subreddit.display_name,
-                }
-            )
+        # One listing request carries every field the embeds need
+        posts = (await fetch_listing("memes", "new", limit=count))[:count]
 
-        if not memes:
-            await interaction.response.send_message(
+        if not posts:
+            await interaction.followup.send(
                 "Couldn't fetch memes at the moment. Please try again later."
             )
             return
 
-        # Create embeds for each meme to display them nicely
-        embeds = []
-        for meme in memes:
-            embed = discord.Embed(
-                title=meme["title"],
-                url=meme["postLink"],
-                description=f"Subreddit: {meme['subreddit']}",
-                color=discord.Color.green(),
+        # Discord allows 10 embeds per message; send each chunk as soon as it is built
+        for i in range(0, len(posts), 10):
+            embeds = [build_embed(post) for post in posts[i:i + 10]]
+            await interaction.followup.send(
+                f"Here are your memes {i + 1}-{i + len(embeds)}:",
+                embeds=embeds
             )
-            embed.set_image(url=meme["url"])
-            embed.set_footer(text=f"👍 {meme['ups']} | Author: {meme['author']}")
-            embeds.append(embed)
-
-        # Send the embed messages with memes to Discord, limiting to 10 embeds per message
-        for i in range(0, len(embeds), 10):
-            # Ensure only one response is sent for the interaction
-            if i == 0:
-                await interaction.response.send_message(
-                    f"Here are your memes {i + 1}-{min(i + 10, len(embeds))}:",
-                    embeds=embeds[i:i + 10]
-                )
-            else:
-                await interaction.followup.send(
-                    f"Here are your memes {i + 1}-{min(i + 10, len(embeds))}:",
-                    embeds=embeds[i:i + 10]
-                )
-    except asyncpraw.exceptions.PRAWException as e:
+    except Exception as e:
         print(f"Error fetching memes: {e}")
         await interaction.followup.send(
             "There was an error fetching memes. Please try again later."
@@ -604,39 +2676,10 @@ async def memes_by_number(interaction: discord.Interaction, count: int):
 
 @bot.tree.command(name="invite", description="Get the invite link to add the bot to your server.")
 async def invite(interaction: discord.Interaction):
-    bot_invite_link = f"https://discord.com/oauth2/authorize?client_id={bot.user.id}&permissions=8&scope=bot%20applications.commands"
-    
-    # Create embed
-    embed = discord.Embed(
-        title="🤖 Invite Me to Your Server!",
-        description="Click the button below to add me to your server and start enjoying memes and jokes!",
-        color=discord.Color.blue()
-    )
-    embed.add_field(
-        name="Features",
-        value="• Auto-posting memes\n• Random jokes\n• Easy to use commands\n• And much more!",
-        inline=False
-    )
+    # Copy the cached embed for the per-user footer
+    embed = response_templates.get("invite", build_invite_embed).copy()
     embed.set_footer(text=f"Requested by {interaction.user}")
-
-    # Create buttons
-    invite_button = Button(
-        label="Add to Server", 
-        style=discord.ButtonStyle.link,
-        url=bot_invite_link,
-        emoji="➕"
-    )
-    support_button = Button(
-        label="Support Server",
-        style=discord.ButtonStyle.link,
-        url="https://discord.gg/TpD8qT5z54",
-        emoji="❓"
-    )
-
-    # Create view and add buttons
-    view = View()
-    view.add_item(invite_button)
-    view.add_item(support_button)
+    view = response_templates.get("invite_view", build_invite_view, bot.user.id)
 
     # Send the message (not ephemeral)
     await interaction.response.send_message(embed=embed, view=view)
@@ -651,13 +2694,21 @@ async def setchannel(interaction: discord.Interaction, channel: discord.TextChan
         
         search_query = search_query.strip().lower()
         time_in_seconds = parse_time(interval)
+        if time_in_seconds < AUTOPOST_MIN_INTERVAL:
+            await interaction.response.send_message(
+                f"The interval must be at least {format_time(AUTOPOST_MIN_INTERVAL)}.", ephemeral=True
+            )
+            return
 
         active_channels[channel.id] = {
             "channel": channel,
+            "guild_id": channel.guild.id,
             "search_query": search_query,
             "interval": time_in_seconds
         }
-        asyncio.create_task(post_meme_to_channel(channel, time_in_seconds, search_query))
+        stopped_channels.discard(channel.id)
+        auto_post_scheduler.add(channel.id, time_in_seconds, first_delay=0)
+        await save_channel_config(channel.id)
         await interaction.response.send_message(f"Set {channel.mention} as a meme channel with search query '{search_query}' and an interval of {interval}.")
     except ValueError:
         await interaction.response.send_message("Invalid time format. Use 'min' for minutes or 'sec' for seconds.")
@@ -666,6 +2717,8 @@ async def setchannel(interaction: discord.Interaction, channel: discord.TextChan
 async def stopmemes(interaction: discord.Interaction, channel: discord.TextChannel):
     if channel.id in active_channels:
         stopped_channels.add(channel.id)
+        auto_post_scheduler.cancel(channel.id)
+        await save_channel_config(channel.id)
         await interaction.response.send_message(
             f"Stopped posting memes in {channel.mention}."
         )
@@ -682,10 +2735,20 @@ async def startmemes(
     interval: str  # Added interval parameter
 ):
     if channel.id in active_channels and channel.id in stopped_channels:
-        stopped_channels.remove(channel.id)
         interval = active_channels[channel.id]["interval"]
-        # Pass subreddit_name to the post_meme_to_channel function
-        asyncio.create_task(post_meme_to_channel(channel, interval, subreddit_name))
+        if interval < AUTOPOST_MIN_INTERVAL:
+            # Saved before the minimum existed; make them pick a new interval
+            await interaction.response.send_message(
+                f"{channel.mention} was set up with an interval under {format_time(AUTOPOST_MIN_INTERVAL)}. "
+                "Please use /setchannel to choose a longer one.",
+                ephemeral=True
+            )
+            return
+        stopped_channels.remove(channel.id)
+        # Resume with the new subreddit_name on the channel's existing interval
+        active_channels[channel.id]["search_query"] = subreddit_name
+        auto_post_scheduler.add(channel.id, interval, first_delay=0)
+        await save_channel_config(channel.id)
         await interaction.response.send_message(
             f"Resumed posting memes from {subreddit_name} in {channel.mention}."
         )
@@ -694,51 +2757,73 @@ async def startmemes(
             f"{channel.mention} is not set up or already active."
         )
 
-@bot.tree.command(name="stats", description="Show bot statistics.")
-async def stats(interaction: discord.Interaction):
-    def generate_stats_embed():
-        embed = Embed(title="Bot Statistics", color=discord.Color.green())
-        embed.add_field(name="Memes Posted", value=str(memes_posted), inline=True)
-        embed.add_field(name="Meme Commands Used", value=str(meme_command_count), inline=True)
-        embed.add_field(
-            name="Active Channels", value=str(len(active_channels)), inline=True
-        )
-        embed.add_field(
-            name="Stopped Channels", value=str(len(stopped_channels)), inline=True
-        )
-
-        if active_channels:
-            sample_channel = list(active_channels.values())[0]
-            interval = sample_channel["interval"]
-            formatted_interval = format_time(interval)
-            embed.add_field(
-                name="Sample Interval", value=formatted_interval, inline=False
-            )
-
-        avatar_url = (
-            bot.user.avatar.url if bot.user.avatar else bot.user.default_avatar.url
-        )
-        embed.set_thumbnail(url=avatar_url)
-        return embed
+@bot.tree.command(name="trigger_keywords", description="Set the phrases that make the bot post a meme in this server.")
+@app_commands.default_permissions(manage_guild=True)
+@checks.has_permissions(manage_guild=True)
+async def trigger_keywords(interaction: discord.Interaction, keywords: str = None):
+    if interaction.guild is None:
+        await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+        return
 
-    initial_embed = generate_stats_embed()
+    guild_id = interaction.guild.id
+    if keywords is None:
+        current = ", ".join(f"'{keyword}'" for keyword in get_trigger_matcher(guild_id).keywords) or "None"
+        await interaction.response.send_message(f"Current trigger phrases: {current}", ephemeral=True)
+        return
 
-    refresh_button = Button(label="Refresh Stats", style=discord.ButtonStyle.primary)
+    if keywords.strip().lower() == "default":
+        guild_matchers.pop(guild_id, None)
+        try:
+            await channel_store.delete_setting(f"keywords:{guild_id}")
+        except Exception as e:
+            print(f"Error saving trigger keywords: {e}")
+            await interaction.response.send_message(
+                "Trigger phrases reset to the defaults, but the change couldn't be saved and will be lost on restart.",
+                ephemeral=True
+            )
+            return
+        await interaction.response.send_message("Trigger phrases reset to the defaults.", ephemeral=True)
+        return
 
-    async def refresh_callback(interaction: discord.Interaction):
-        updated_embed = generate_stats_embed()
-        await interaction.response.edit_message(embed=updated_embed, view=view)
+    matcher = KeywordMatcher(keywords.split(","))
+    if len(matcher.keywords) > TRIGGER_MAX_KEYWORDS:
+        await interaction.response.send_message(f"Please provide at most {TRIGGER_MAX_KEYWORDS} phrases.", ephemeral=True)
+        return
 
-    refresh_button.callback = refresh_callback
+    guild_matchers[guild_id] = matcher
+    phrases = ", ".join(f"'{keyword}'" for keyword in matcher.keywords) or "None (triggers disabled)"
+    try:
+        await channel_store.save_setting(f"keywords:{guild_id}", matcher.keywords)
+    except Exception as e:
+        print(f"Error saving trigger keywords: {e}")
+        await interaction.response.send_message(
+            f"Trigger phrases set to: {phrases}, but they couldn't be saved and will be lost on restart.",
+            ephemeral=True
+        )
+        return
+    await interaction.response.send_message(f"Trigger phrases set to: {phrases}", ephemeral=True)
 
-    view = View()
-    view.add_item(refresh_button)
+@trigger_keywords.error
+async def trigger_keywords_error(interaction: discord.Interaction, error):
+    # The tree's on_error only logs; make sure the user always gets an answer
+    if isinstance(error, app_commands.MissingPermissions):
+        message = "You need the Manage Server permission to change trigger phrases."
+    else:
+        message = "Something went wrong while updating trigger phrases. Please try again."
+    if interaction.response.is_done():
+        await interaction.followup.send(message, ephemeral=True)
+    else:
+        await interaction.response.send_message(message, ephemeral=True)
 
-    await interaction.response.send_message(embed=initial_embed, view=view)
+@bot.tree.command(name="stats", description="Show bot statistics.")
+async def stats(interaction: discord.Interaction):
+    view = response_templates.get("stats_view", build_stats_view)
+    await interaction.response.send_message(embed=stats_embed(), view=view)
 
 @bot.tree.command(name="command_history", description="View the history of commands used.")
 async def command_history(interaction: discord.Interaction):
-    if not command_history_list:
+    history = cluster_client.command_history(command_history_list)
+    if not history:
         await interaction.response.send_message("No commands have been used yet.")
         return
     
@@ -750,7 +2835,7 @@ async def command_history(interaction: discord.Interaction):
     
     # Group commands and count their occurrences
     command_counts = {}
-    for cmd in command_history_list:
+    for _, cmd in history:
         command_counts[cmd] = command_counts.get(cmd, 0) + 1
     
     # Format the command history
@@ -782,7 +2867,7 @@ async def random_joke(
         )
         return
 
-    setup, punchline = await get_joke()
+    setup, punchline = await get_joke(target_channel.id)
     
     if setup and punchline:
         # Create embed
@@ -798,7 +2883,7 @@ async def random_joke(
         new_joke_button = Button(label="New Joke", style=discord.ButtonStyle.primary, emoji="🎲")
         
         async def new_joke_callback(button_interaction: discord.Interaction):
-            new_setup, new_punchline = await get_joke()
+            new_setup, new_punchline = await get_joke(button_interaction.channel_id)
             if new_setup and new_punchline:
                 new_embed = discord.Embed(
                     title="😄 Random Joke",
@@ -822,7 +2907,7 @@ async def random_joke(
                 f"Joke sent to {channel.mention}!", 
                 ephemeral=True
             )
-            await channel.send(embed=embed, view=view)
+            await send_queue.send(channel, embed=embed, view=view)
         else:
             await interaction.response.send_message(embed=embed, view=view)
     else:
@@ -1101,35 +3186,318 @@ async def eight_ball(interaction: discord.Interaction, question: str):
 async def gif(interaction: discord.Interaction, keyword: str):
     await interaction.response.defer()  # Acknowledge the interaction
     
-    async with aiohttp.ClientSession() as session:
-        try:
-            # Removed print statement for fetching GIFs
-            async with session.get(f"https://api.giphy.com/v1/gifs/search?api_key=upEsZXwiOekDKkRmMwCRpKUHSLz3OXzu&q={keyword}&limit=5&offset=0&rating=g&lang=en") as response:
-                response.raise_for_status()  # Raise an error for bad responses
-                data = await response.json()
-                
-                if data['data']:
-                    available_gifs = [gif for gif in data['data'] if gif['images']['original']['url'] not in sent_gifs]
-                    
-                    if available_gifs:
-                        selected_gif = random.choice(available_gifs)
-                        gif_url = selected_gif['images']['original']['url']  # Get the selected GIF URL
-                        sent_gifs.add(gif_url)  # Add the GIF URL to the sent list
-                        await interaction.followup.send(gif_url)
-                    else:
-                        await interaction.followup.send("All available GIFs have already been sent for this keyword.")
-                else:
-                    await interaction.followup.send("No GIFs found for that keyword.")
-        except aiohttp.ClientError as e:
-            await interaction.followup.send(f"An error occurred while fetching GIFs: {str(e)}")
-        except Exception as e:
-            await interaction.followup.send(f"An unexpected error occurred: {str(e)}")
+    try:
+        history_scope = interaction.guild_id or interaction.channel_id  # GIF history is kept per server
+        gif_url, total = await get_gif(keyword, history_scope)
+
+        if gif_url:
+            await interaction.followup.send(gif_url)
+        elif total:
+            await interaction.followup.send("All available GIFs have already been sent for this keyword.")
+        else:
+            await interaction.followup.send("No GIFs found for that keyword.")
+    except aiohttp.ClientError as e:
+        await interaction.followup.send(f"An error occurred while fetching GIFs: {str(e)}")
+    except Exception as e:
+        await interaction.followup.send(f"An unexpected error occurred: {str(e)}")
+
+@bot.tree.command(name="sync_commands", description="Re-upload the slash commands to Discord (bot owner only).")
+async def sync_commands_command(interaction: discord.Interaction):
+    if not await bot.is_owner(interaction.user):
+        await interaction.response.send_message("Only the bot owner can use this command.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+    start_time = time.time()
+    try:
+        synced = await sync_commands(force=True)
+        await interaction.followup.send(
+            f"Synced {len(synced)} command(s) in {time.time() - start_time:.2f} seconds.", ephemeral=True
+        )
+    except discord.HTTPException as e:
+        await interaction.followup.send(f"Command sync failed: {e}", ephemeral=True)
+
+@bot.tree.command(name="diagnostics", description="Show event loop health (bot owner only).")
+async def diagnostics(interaction: discord.Interaction):
+    if not await bot.is_owner(interaction.user):
+        await interaction.response.send_message("Only the bot owner can use this command.", ephemeral=True)
+        return
+
+    embed = discord.Embed(title="🩺 Event Loop Diagnostics", color=discord.Color.orange())
+    embed.add_field(
+        name="Loop Lag",
+        value=(
+            f"p50 ≤ {loop_lag.quantile(0.5) * 1000:.0f} ms | p99 ≤ {loop_lag.quantile(0.99) * 1000:.0f} ms | "
+            f"max {loop_monitor.max_lag * 1000:.0f} ms"
+        ),
+        inline=False
+    )
+    embed.add_field(name="Stalls", value=f"{loop_monitor.stall_count} over {LOOP_STALL_THRESHOLD * 1000:.0f} ms", inline=True)
+    embed.add_field(name="Tasks", value=str(len(asyncio.all_tasks())), inline=True)
+
+    if loop_monitor.stalls:
+        when, lag, stack = loop_monitor.stalls[-1]
+        detail = f"{when:%H:%M:%S} - {lag * 1000:.0f} ms"
+        if stack:
+            detail += f"\n```{stack[-900:]}```"
+        embed.add_field(name="Last Stall", value=detail, inline=False)
+    if loop_monitor.slow_callbacks:
+        when, message = loop_monitor.slow_callbacks[-1]
+        embed.add_field(name="Last Slow Callback", value=f"{when:%H:%M:%S} - {message[:900]}", inline=False)
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="server_counter", description="Show how many servers the bot has joined.")
 async def server_counter(interaction: discord.Interaction):
-    server_count = len(bot.guilds)  # Count the number of servers the bot has joined
+    server_count = get_server_count()  # Count the number of servers the bot has joined
     await interaction.response.send_message(f"The bot is currently in {server_count} servers.")
 
+# ===== CLUSTER =====
+def cluster_snapshot():
+    return {
+        "worker": CLUSTER_WORKER_ID,
+        "guilds": len(bot.guilds),
+        "memes_posted": memes_posted,
+        "meme_command_count": meme_command_count,
+        "active_channels": len(active_channels),
+        "stopped_channels": len(stopped_channels),
+        "command_history": list(command_history_list)
+    }
+
+class ClusterClient:
+    # Runs in each worker: reports this worker's counters to the launcher every interval
+    # and keeps the other workers' latest reports, so totals are live for this worker and at
+    # most one interval old for the rest. Outside a cluster it does nothing.
+    def __init__(self, worker_id, host, port, interval):
+        self.worker_id = worker_id
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.peers = []  # Latest snapshots from the other workers
+        self.task = None
+
+    @property
+    def enabled(self):
+        return self.worker_id >= 0
+
+    def total(self, key, local_value):
+        return local_value + sum(peer.get(key, 0) for peer in self.peers)
+
+    def command_history(self, local_history):
+        merged = list(local_history)
+        for peer in self.peers:
+            merged.extend(tuple(entry) for entry in peer["command_history"])
+        merged.sort()
+        return merged[-local_history.maxlen:]
+
+    async def run(self):
+        while True:
+            writer = None
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                while True:
+                    writer.write(json.dumps(cluster_snapshot()).encode() + b"\n")
+                    await writer.drain()
+                    line = await reader.readline()
+                    if not line:
+                        raise ConnectionError("launcher closed the connection")
+                    self.peers = [peer for peer in json.loads(line) if peer["worker"] != self.worker_id]
+                    await asyncio.sleep(self.interval)
+            except (OSError, ValueError) as e:
+                print(f"Cluster report failed: {e}")
+                await asyncio.sleep(self.interval)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+    def start(self):
+        if self.enabled and self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+cluster_client = ClusterClient(CLUSTER_WORKER_ID, CLUSTER_IPC_HOST, CLUSTER_IPC_PORT, CLUSTER_REPORT_INTERVAL)
+
+class ClusterCoordinator:
+    # Runs in the launcher; every report is answered with all workers' latest snapshots
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.snapshots = {}  # worker id -> latest snapshot
+        self.server = None
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                snapshot = json.loads(line)
+                self.snapshots[snapshot["worker"]] = snapshot
+                writer.write(json.dumps(list(self.snapshots.values())).encode() + b"\n")
+                await writer.drain()
+        except (OSError, ValueError) as e:
+            print(f"Cluster worker connection error: {e}")
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+async def resolve_shard_count():
+    if SHARD_COUNT.isdigit():
+        return int(SHARD_COUNT)
+    # Ask Discord how many shards it recommends for this bot
+    async with aiohttp.ClientSession() as session:
+        async with session.get("https://discord.com/api/v10/gateway/bot", headers={"Authorization": f"Bot {TOKEN}"}) as response:
+            response.raise_for_status()
+            return (await response.json())["shards"]
+
+def split_shards(shard_count, workers):
+    # Contiguous shard ranges, as even as possible
+    base, extra = divmod(shard_count, workers)
+    ranges = []
+    start = 0
+    for worker_id in range(workers):
+        size = base + (1 if worker_id < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+async def supervise_worker(worker_id, shard_ids, shard_count, workers):
+    env = dict(
+        os.environ,
+        CLUSTER_WORKERS="1",
+        CLUSTER_WORKER_ID=str(worker_id),
+        SHARD_COUNT=str(shard_count),
+        SHARD_IDS=",".join(map(str, shard_ids))
+    )
+    # Each worker has its own upstream rate limiters; split the configured rates between them
+    for name, rate, burst in (
+        ("REDDIT", REDDIT_RATE_LIMIT, REDDIT_RATE_BURST),
+        ("JOKEAPI", JOKEAPI_RATE_LIMIT, JOKEAPI_RATE_BURST),
+        ("GIPHY", GIPHY_RATE_LIMIT, GIPHY_RATE_BURST),
+    ):
+        env[f"{name}_RATE_LIMIT"] = str(rate / workers)
+        env[f"{name}_RATE_BURST"] = str(max(1, burst // workers))
+    if METRICS_PORT:
+        env["METRICS_PORT"] = str(METRICS_PORT + worker_id)  # One scrape target per worker
+    restart_delay = 5
+    while True:
+        print(f"Starting worker {worker_id} with shards {shard_ids[0]}-{shard_ids[-1]} of {shard_count}")
+        started_at = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), env=env, stdin=asyncio.subprocess.DEVNULL
+        )
+        try:
+            code = await process.wait()
+        except asyncio.CancelledError:
+            process.terminate()
+            await process.wait()
+            raise
+        if code == 0:
+            return
+        if time.monotonic() - started_at > 300:
+            restart_delay = 5  # It ran fine for a while; don't keep the long backoff
+        print(f"Worker {worker_id} exited with code {code}; restarting in {restart_delay} s")
+        await asyncio.sleep(restart_delay)
+        restart_delay = min(restart_delay * 2, 300)
+
+async def run_cluster():
+    # Spread the shards over CLUSTER_WORKERS processes, one gateway connection set and one core each
+    shard_count = await resolve_shard_count()
+    workers = min(CLUSTER_WORKERS, shard_count)
+    coordinator = ClusterCoordinator(CLUSTER_IPC_HOST, CLUSTER_IPC_PORT)
+    await coordinator.start()
+    print(f"Launching {workers} workers for {shard_count} shards")
+    try:
+        await asyncio.gather(*(
+            supervise_worker(worker_id, shard_ids, shard_count, workers)
+            for worker_id, shard_ids in enumerate(split_shards(shard_count, workers))
+        ))
+    finally:
+        await coordinator.stop()
+
+# ===== METRIC COLLECTORS =====
+metrics.callback_counter("memebot_memes_posted_total", "Memes auto-posted to channels.", lambda: memes_posted)
+metrics.callback_counter("memebot_meme_commands_total", "Uses of /meme and its refresh button.", lambda: meme_command_count)
+metrics.callback_counter(
+    "memebot_upstream_requests_total", "Requests sent to each upstream.",
+    lambda: {(name,): count for name, count in upstream_request_counts.items()}, ("upstream",)
+)
+metrics.callback_counter(
+    "memebot_cache_requests_total", "Cache lookups by cache and result.",
+    lambda: {
+        ("listing", "hit"): listing_cache.hits,
+        ("listing", "stale"): listing_cache.stale_hits,
+        ("listing", "miss"): listing_cache.misses,
+        ("prefetch", "hit"): prefetch_pool.hits,
+        ("prefetch", "miss"): prefetch_pool.misses,
+        ("top_listing", "hit"): top_listings.hits,
+        ("top_listing", "miss"): top_listings.misses,
+        ("gif_page", "hit"): gif_pages.hits,
+        ("gif_page", "miss"): gif_pages.misses,
+        ("gif_page", "coalesced"): gif_flights.coalesced,
+        ("jokes", "hit"): joke_pool.hits,
+        ("jokes", "miss"): joke_pool.misses,
+        ("jokes", "fallback"): joke_pool.fallbacks,
+        ("listing_flight", "coalesced"): listing_flights.coalesced,
+    },
+    ("cache", "result")
+)
+metrics.callback_counter(
+    "memebot_response_templates_total", "Embed/view template lookups by result.",
+    lambda: {("hit",): response_templates.hits, ("build",): response_templates.builds}, ("result",)
+)
+metrics.gauge("memebot_listing_cache_entries", "Subreddit listings held in memory.", lambda: len(listing_cache.entries))
+metrics.callback_counter(
+    "memebot_top_listing_refreshes_total", "Background refreshes of /top_memes listings by result.",
+    lambda: {("ok",): top_listings.refreshes, ("failed",): top_listings.failures}, ("result",)
+)
+metrics.gauge(
+    "memebot_top_listing_age_seconds", "Age of the oldest cached top listing per timeframe.",
+    lambda: {(timeframe,): age for timeframe, age in top_listings.ages().items()}, ("timeframe",)
+)
+metrics.gauge("memebot_joke_pool_size", "Jokes ready to send.", lambda: len(joke_pool.jokes))
+metrics.gauge("memebot_prefetch_buffered", "Memes waiting in prefetch buffers.", lambda: sum(len(buffer) for buffer in prefetch_pool.buffers.values()))
+metrics.gauge(
+    "memebot_dedup_memory_bytes", "Memory used by repeat filters.",
+    lambda: {("posts",): post_history.memory_bytes(), ("gifs",): gif_history.memory_bytes(), ("jokes",): joke_history.memory_bytes()}, ("filter",)
+)
+metrics.gauge(
+    "memebot_upstream_queue_depth", "Requests waiting for an upstream rate-limit token.",
+    lambda: {(name,): limiter.queue_depth() for name, limiter in upstream_limiters.items()}, ("upstream",)
+)
+metrics.gauge(
+    "memebot_upstream_max_wait_seconds", "Longest wait for an upstream rate-limit token.",
+    lambda: {(name,): limiter.max_wait for name, limiter in upstream_limiters.items()}, ("upstream",)
+)
+metrics.gauge("memebot_send_queue_size", "Messages waiting in the send queue.", lambda: send_queue.size)
+metrics.callback_counter(
+    "memebot_send_queue_jobs_total", "Send queue jobs by result.",
+    lambda: {
+        ("sent",): send_queue.sent,
+        ("failed",): send_queue.failed,
+        ("stale",): send_queue.dropped_stale,
+        ("refused",): send_queue.rejected,
+    },
+    ("result",)
+)
+metrics.gauge("memebot_scheduled_channels", "Channels with an active auto-post schedule.", lambda: len(auto_post_scheduler))
+metrics.gauge("memebot_guilds", "Servers the bot is in.", lambda: len(bot.guilds))
+metrics.callback_counter("memebot_event_loop_stalls_total", "Probe ticks that were late by more than the stall threshold.", lambda: loop_monitor.stall_count)
+metrics.gauge("memebot_event_loop_max_lag_seconds", "Worst event loop lag seen since startup.", lambda: loop_monitor.max_lag)
+metrics.gauge("memebot_asyncio_tasks", "Tasks alive on the event loop.", lambda: len(asyncio.all_tasks()))
+
 # ===== MAIN EXECUTION =====
 def run_bot():
     try:
@@ -1140,8 +3508,12 @@ def run_bot():
         )
     except Exception as e:
         print(f"Error occurred: {e}")
-        input("Press Enter to exit...") # Add this line to keep console open
+        if CLUSTER_WORKER_ID < 0:
+            input("Press Enter to exit...") # Add this line to keep console open
         sys.exit(1)
 
 if __name__ == "__main__":
-    run_bot()
+    if CLUSTER_WORKERS > 1 and CLUSTER_WORKER_ID < 0:
+        asyncio.run(run_cluster())
+    else:
+        run_bot()
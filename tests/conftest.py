@@ -0,0 +1,22 @@
+# Shared fixtures: main.py is imported once per session, pointed at the local fake upstreams
+# from benchmarks/, so every test talks to the same stand-ins and never to the real services.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+os.environ.setdefault("LOOP_PROBE_INTERVAL", "0.02")
+
+from run_benchmarks import UpstreamThread, import_bot
+import run_benchmarks
+
+@pytest.fixture(scope="session")
+def bot():
+    upstream_thread = UpstreamThread(latency=0.05, jitter=0.02, error_rate=0.0)
+    upstreams = upstream_thread.start()
+    try:
+        import_bot(upstreams.base_url)
+        yield run_benchmarks.main
+    finally:
+        upstream_thread.stop()
@@ -0,0 +1,20 @@
+# Channel store backends must implement the whole interface, and fail when created if not.
+import pytest
+
+def test_incomplete_backend_fails_when_created(bot):
+    class SchedulesOnlyStore(bot.ChannelStore):
+        async def load_all(self):
+            return []
+
+        async def save(self, row):
+            pass
+
+        async def delete(self, channel_id):
+            pass
+
+    with pytest.raises(TypeError, match="save_setting"):
+        SchedulesOnlyStore()
+
+def test_shipped_backends_are_complete(bot, tmp_path):
+    for name, backend in bot.CHANNEL_STORES.items():
+        backend(str(tmp_path / f"{name}.db"))
@@ -0,0 +1,56 @@
+# Regression test: the Reddit-backed slash commands must never block the event loop.
+# Runs /meme_search, /top_memes and /memes_by_number with fake interactions against the
+# local fake Reddit server from benchmarks/ while the loop monitor watches for stalls.
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from load_interactions import WORKLOAD, LoadHarness
+
+MAX_LOOP_LAG = 0.25  # Seconds; anything longer would hold up heartbeats and every other command
+COMMANDS = ("meme_search", "top_memes", "memes_by_number")
+INVOCATIONS_PER_COMMAND = 40
+
+def test_loop_monitor_catches_blocking_calls(bot):
+    # Guards the real test against passing because the monitor saw nothing
+    monitor = bot.LoopMonitor(0.02, MAX_LOOP_LAG, False, False)
+
+    async def block():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(MAX_LOOP_LAG + 0.1)
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    asyncio.run(block())
+    assert monitor.max_lag >= MAX_LOOP_LAG
+
+def test_reddit_commands_never_block_the_event_loop(bot):
+    random.seed(1)
+    args = SimpleNamespace(channels=50, guilds=10, deadline=3.0, concurrency=60)
+    invocations = [(name, WORKLOAD[name][1]()) for name in COMMANDS for _ in range(INVOCATIONS_PER_COMMAND)]
+    random.shuffle(invocations)
+
+    async def run():
+        bot.get_http_session()
+        bot.loop_monitor.start()
+        bot.top_listings.start()
+        try:
+            harness = LoadHarness(args)
+            await asyncio.gather(*(harness.guarded(name, options) for name, options in invocations))
+            return harness
+        finally:
+            bot.loop_monitor.stop()
+            await bot.top_listings.stop()
+            await bot.prefetch_pool.stop()
+            await bot.close_http_session()
+
+    reddit_before = bot.upstream_request_counts["reddit"]
+    harness = asyncio.run(run())
+
+    assert not harness.exceptions
+    assert all(timeline.acked_at is not None for timeline in harness.timelines)
+    assert bot.upstream_request_counts["reddit"] > reddit_before  # The commands really went to the fake server
+    assert bot.loop_monitor.max_lag < MAX_LOOP_LAG, f"event loop blocked for {bot.loop_monitor.max_lag * 1000:.0f} ms"
+    assert bot.loop_monitor.stall_count == 0
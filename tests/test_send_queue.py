@@ -0,0 +1,40 @@
+# Interactive sends (keyword-trigger replies, /random_joke posts) must not wait behind a
+# backlog of auto-posts in the outbound send queue.
+import asyncio
+import time
+from types import SimpleNamespace
+
+AUTO_POSTS = 400  # Ten seconds of backlog at the default 40 messages per second
+MAX_INTERACTIVE_WAIT = 1.0
+
+def fake_channel(channel_id, sent):
+    async def send(content):
+        sent.append((channel_id, content))
+        return content
+    return SimpleNamespace(id=channel_id, send=send)
+
+def test_interactive_send_skips_queued_auto_posts(bot):
+    async def run():
+        queue = bot.SendQueue(5000, 40, 1, 5, 20)
+        sent = []
+        for i in range(AUTO_POSTS):
+            queue.submit(fake_channel(i % 100, sent), f"auto {i}", priority=bot.PRIORITY_AUTOPOST)
+        await asyncio.sleep(0.2)  # Let the backlog start draining
+
+        try:
+            started = time.monotonic()
+            # One channel with auto-posts of its own still queued, one with nothing queued
+            busy = await asyncio.wait_for(queue.send(fake_channel(5, sent), "busy reply"), MAX_INTERACTIVE_WAIT)
+            idle = await asyncio.wait_for(queue.send(fake_channel(1000, sent), "idle reply"), MAX_INTERACTIVE_WAIT)
+            waited = time.monotonic() - started
+            backlog = queue.size
+            behind_busy = len(queue.pending.get(5, ()))
+        finally:
+            await queue.stop()
+        return busy, idle, waited, backlog, behind_busy
+
+    busy, idle, waited, backlog, behind_busy = asyncio.run(run())
+    assert (busy, idle) == ("busy reply", "idle reply")
+    assert waited < MAX_INTERACTIVE_WAIT
+    assert backlog > AUTO_POSTS // 2  # The auto-posts really were still queued
+    assert behind_busy > 0  # Went ahead of channel 5's own auto-posts
@@ -0,0 +1,37 @@
+# /memes_by_number must build every embed from a single Reddit listing request, and split
+# them into messages of at most 10 embeds (Discord's per-message limit).
+import asyncio
+from types import SimpleNamespace
+
+class RecordingInteraction:
+    def __init__(self):
+        self.deferred = False
+        self.followups = []  # (content, embeds) per followup message
+        self.response = SimpleNamespace(defer=self.defer, send_message=self.send_message)
+        self.followup = SimpleNamespace(send=self.send)
+
+    async def defer(self, **kwargs):
+        self.deferred = True
+
+    async def send_message(self, content=None, **kwargs):
+        raise AssertionError(f"expected a deferred response, got {content!r}")
+
+    async def send(self, content=None, embeds=(), **kwargs):
+        self.followups.append((content, list(embeds)))
+
+def test_memes_by_number_makes_one_reddit_request(bot):
+    interaction = RecordingInteraction()
+
+    async def run():
+        bot.get_http_session()
+        try:
+            await bot.memes_by_number.callback(interaction, 20)
+        finally:
+            await bot.close_http_session()
+
+    reddit_before = bot.upstream_request_counts["reddit"]
+    asyncio.run(run())
+
+    assert bot.upstream_request_counts["reddit"] - reddit_before == 1
+    assert interaction.deferred
+    assert [len(embeds) for _, embeds in interaction.followups] == [10, 10]